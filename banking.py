@@ -0,0 +1,910 @@
+"""
+Banking library: users, accounts, storage backends and the Bank itself.
+
+Importing this module does no work beyond defining it. The logging module is
+only imported when the first message is logged and the email regex is only
+compiled when the first address is validated, so tools and workers that
+import the library start quickly. Configuring logging is left to the entry
+point (see banking_app_test_v4.py).
+"""
+import heapq
+import sys
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+
+class _LazyLogging:
+    """Stands in for the logging module until the first message is logged, then replaces itself with it."""
+
+    def __getattr__(self, name):
+        import logging as logging_module
+        globals()['logging'] = logging_module
+        return getattr(logging_module, name)
+
+logging = _LazyLogging()
+
+EMAIL_PATTERN = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
+_email_regex = None  # EMAIL_PATTERN, compiled on first use
+# Dictionary of every account type seen, mapping it to the one string instance all accounts of that type share
+_account_types = {}
+BALANCE_BUCKET_EDGES = (0, 100, 1000, 10000, 100000, 1000000)  # Lower edges of the balance histogram buckets
+
+class User:
+    __slots__ = ('name', 'contact_info')
+
+    def __init__(self, name, contact_info):
+        """Represents a user in the banking system."""
+        if self.validate_name(name):
+            # Names repeat across many users, so they share one interned copy.
+            # Emails are unique per account, so interning them would only add overhead.
+            self.name = sys.intern(name)
+        else:
+            raise ValueError("Name must contain only letters.")
+
+        if self.validate_email(contact_info):
+            self.contact_info = contact_info
+        else:
+            raise ValueError("Invalid email address.")
+
+    @staticmethod
+    def validate_email(email):
+        """Validates an email address."""
+        global _email_regex
+        if _email_regex is None:
+            import re
+            _email_regex = re.compile(EMAIL_PATTERN)
+        return _email_regex.match(email) is not None
+
+    @staticmethod
+    def validate_name(name):
+        """Validates that the name contains only letters."""
+        return name.isalpha()
+
+    def display_user_details(self):
+        logging.info(f"User Name: {self.name}")
+        logging.info(f"Contact Info: {self.contact_info}")
+
+class Account:
+    __slots__ = ('user', 'account_type', 'balance', 'version')
+
+    def __init__(self, user, account_type, balance=0):
+        """Represents an individual bank account."""
+        self.user = user
+        if self.validate_account_type(account_type):
+            self.account_type = _account_types.setdefault(account_type, account_type)
+        else:
+            raise ValueError("Account type must contain only letters and numbers.")
+        self.balance = round(balance, 2)
+        self.version = 0  # Bumped on every balance change so cached summaries can tell they are stale
+
+    @staticmethod
+    def validate_account_type(account_type):
+        """Validates that the account type contains only letters and numbers."""
+        return account_type.isalnum()
+
+    def deposit(self, amount):
+        if amount > 0:
+            self.balance += round(amount, 2)
+            self.version += 1
+            logging.info(f"Deposited ${amount:.2f}. New balance: ${self.balance:.2f}")
+        else:
+            raise ValidationError("Deposit amount must be greater than zero.")
+
+    def withdraw(self, amount):
+        if amount > 0 and amount <= self.balance:
+            self.balance -= round(amount, 2)
+            self.version += 1
+            logging.info(f"Withdrew ${amount:.2f}. New balance: ${self.balance:.2f}")
+        elif amount <= 0:
+            raise ValidationError("Withdrawal amount must be greater than zero.")
+        else:
+            raise InsufficientFundsError("Insufficient balance for withdrawal.")
+
+    def transfer(self, amount, target_account):
+        if isinstance(target_account, Account):
+            if amount > 0 and amount <= self.balance:
+                self.withdraw(amount)
+                target_account.deposit(amount)
+                logging.info(f"Transferred ${amount:.2f} to {target_account.user.name}. Your new balance: ${self.balance:.2f}")
+            else:
+                logging.error("Insufficient balance to transfer.")
+        else:
+            logging.error("Target account is not valid.")
+
+    def compare_balance(self, other_account):
+        """
+        Compare the balance of this account with another account.
+
+        :param other_account: Another BankAccount object to compare with
+        :return: String indicating whether the balance is 'larger', 'smaller', or 'equal'
+        """
+        if isinstance(other_account, Account):
+            if self > other_account:
+                return "larger than"
+            elif self < other_account:
+                return "smaller than"
+            else:
+                return "equal to"
+        else:
+            logging.error("Comparison account is not valid.")
+            return None 
+
+    def display_account_details(self):
+        logging.info(f"Account Holder: {self.user.name}")
+        logging.info(f"Account Type: {self.account_type}")
+        logging.info(f"Balance: ${self.balance:.2f}")
+
+    def __eq__(self, other):
+        """
+        Equality comparison between two bank accounts based on balance.
+
+        :param other: The other BankAccount object to compare
+        :return: True if balances are equal, False otherwise
+        """
+        if isinstance(other, Account):
+            return self.balance == other.balance
+        return False
+
+    def __gt__(self, other):
+        """
+        Greater than comparison between two bank accounts based on balance.
+
+        :param other: The other BankAccount object to compare
+        :return: True if this account's balance is greater, False otherwise
+        """
+        if isinstance(other, Account):
+            return self.balance > other.balance
+        return False
+
+    def __lt__(self, other):
+        """
+        Less than comparison between two bank accounts based on balance.
+
+        :param other: The other BankAccount object to compare
+        :return: True if this account's balance is less, False otherwise
+        """
+        if isinstance(other, Account):
+            return self.balance < other.balance
+        return False
+
+class StorageBackend(ABC):
+    """
+    Interface for the place where a Bank keeps its accounts.
+
+    Account objects handed out by a backend are plain in-memory objects; after
+    changing a balance, the Bank reports it back through record_postings so
+    that persistent backends can write it out.
+    """
+
+    accounts = None  # Mapping of account ID to Account
+
+    @abstractmethod
+    def add_account(self, account):
+        """
+        Store a new account and assign it an ID.
+
+        :param account: Account object to store
+        :return: The new account's ID
+        """
+
+    @abstractmethod
+    def get_account(self, account_id):
+        """
+        :param account_id: ID of the account to look up
+        :return: The Account, or None if there is no such account
+        """
+
+    @abstractmethod
+    def has_email(self, email):
+        """
+        :param email: Email address to check
+        :return: True if an account is already registered with this email
+        """
+
+    @abstractmethod
+    def iter_accounts(self, after_id=0):
+        """
+        Lazily yield (account_id, account) pairs in account ID order.
+
+        :param after_id: Only yield accounts with an ID greater than this
+        """
+
+    @abstractmethod
+    def record_postings(self, postings):
+        """
+        Record new balances; all postings passed in one call commit together.
+
+        :param postings: Iterable of (account_id, balance) pairs
+        """
+
+    def balance_counts(self):
+        """
+        Count the accounts holding each balance, which is all a Bank needs to build its aggregates.
+
+        Backends that can count in their own query language should override this
+        instead of loading every account.
+
+        :return: Iterable of (account_type, balance in cents, number of accounts) tuples
+        """
+        counts = {}
+        for _, account in self.iter_accounts():
+            key = (account.account_type, round(account.balance * 100))
+            counts[key] = counts.get(key, 0) + 1
+        return [(account_type, balance_cents, count) for (account_type, balance_cents), count in counts.items()]
+
+    def flush(self):
+        """Write out any postings that are still buffered."""
+
+    def close(self):
+        """Flush and release any resources held by the backend."""
+        self.flush()
+
+class InMemoryStorage(StorageBackend):
+    def __init__(self):
+        """Default storage backend that keeps every account in process memory."""
+        self.accounts = {}
+        self.registered_emails = set()
+        self.next_account_id = 1
+
+    def add_account(self, account):
+        account_id = self.next_account_id
+        self.accounts[account_id] = account
+        self.registered_emails.add(account.user.contact_info)  # Add email to the set
+        self.next_account_id += 1
+        return account_id
+
+    def get_account(self, account_id):
+        return self.accounts.get(account_id)
+
+    def has_email(self, email):
+        return email in self.registered_emails
+
+    def iter_accounts(self, after_id=0):
+        # Account IDs are handed out sequentially and never reused, so resuming
+        # from a cursor is a direct lookup instead of a scan from the start.
+        for account_id in range(after_id + 1, self.next_account_id):
+            account = self.accounts.get(account_id)
+            if account is not None:
+                yield account_id, account
+
+    def record_postings(self, postings):
+        # The Account objects in self.accounts already hold the new balances.
+        pass
+
+class AccountSummary:
+    def __init__(self, balance, lines):
+        """
+        Cached view of an account: its balance and its preformatted display lines.
+
+        :param balance: Balance of the account when the summary was built
+        :param lines: Tuple of display lines, ready to be logged
+        """
+        self.balance = balance
+        self.lines = lines
+
+class AccountSummaryCache:
+    def __init__(self, max_size=1024):
+        """
+        LRU cache of formatted account summaries, keyed by account ID.
+
+        Each entry remembers the Account it was built from and that account's
+        version, so a balance change made directly on the Account is noticed
+        on the next lookup. Changes made through a Bank invalidate the entry
+        explicitly, which also covers backends that hand out fresh Account
+        objects on every lookup.
+
+        :param max_size: Maximum number of summaries kept; the least recently used is dropped first
+        """
+        if max_size <= 0:
+            raise ValueError("Cache size must be greater than zero.")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # account_id -> (account, version, summary), least recently used first
+
+    def get(self, account_id):
+        """
+        :param account_id: ID of the account to look up
+        :return: The cached summary, or None if it is missing or stale
+        """
+        entry = self._entries.get(account_id)
+        if entry is None or entry[0].version != entry[1]:
+            self.misses += 1
+            return None
+        self._entries[account_id] = self._entries.pop(account_id)  # Move to the most recently used end
+        self.hits += 1
+        return entry[2]
+
+    def put(self, account_id, account, summary):
+        """
+        Cache the summary built from an account, evicting the least recently used entry if full.
+
+        :param account_id: ID of the account
+        :param account: Account the summary was built from
+        :param summary: AccountSummary built from the account
+        """
+        self._entries.pop(account_id, None)
+        self._entries[account_id] = (account, account.version, summary)
+        if len(self._entries) > self.max_size:
+            del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, account_id):
+        self._entries.pop(account_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class BalanceAggregate:
+    def __init__(self, bucket_edges=BALANCE_BUCKET_EDGES):
+        """
+        Running count, total, min/max and histogram of a group of account balances.
+
+        Nothing is stored per account: the caller passes each account's old
+        balance along with its new one. Balances are tracked in whole cents, so
+        totals never drift however many postings are applied. Min and max come
+        from a count of the accounts holding each balance, with heaps of the
+        distinct balances whose stale entries are discarded when they reach the
+        top. A posting only pushes onto the heaps when it moves an account to a
+        balance no other account in the group holds, so memory follows the
+        number of distinct balances rather than the number of postings.
+
+        The aggregates assume balances only change through the Bank.
+
+        :param bucket_edges: Increasing lower edges of the histogram buckets
+        """
+        self.bucket_edges = tuple(bucket_edges)
+        self.count = 0
+        self.total_cents = 0
+        self.histogram = [0] * (len(self.bucket_edges) + 1)  # Bucket 0 holds balances below the first edge
+        self._edge_cents = [round(edge * 100) for edge in self.bucket_edges]
+        self._cents_counts = {}  # balance in cents -> number of accounts holding it
+        self._min_heap = []  # balances in cents
+        self._max_heap = []  # negated balances in cents
+
+    def set(self, old_balance, balance):
+        """
+        Add an account to the group or record its new balance.
+
+        :param old_balance: Balance of the account before the posting (None for a new account)
+        :param balance: Current balance of the account
+        """
+        if old_balance is None:
+            self.count += 1
+        else:
+            self._remove(round(old_balance * 100), 1)
+        self._add(round(balance * 100), 1)
+
+    def load(self, balance_cents, count):
+        """
+        Add accounts that all hold the same balance, e.g. when counting a backend's existing accounts.
+
+        :param balance_cents: Balance of the accounts in cents
+        :param count: Number of accounts holding it
+        """
+        self.count += count
+        self._add(balance_cents, count)
+
+    def _add(self, cents, count):
+        self.total_cents += cents * count
+        self.histogram[bisect_right(self._edge_cents, cents)] += count
+        held = self._cents_counts.get(cents, 0)
+        self._cents_counts[cents] = held + count
+        if not held:
+            heapq.heappush(self._min_heap, cents)
+            heapq.heappush(self._max_heap, -cents)
+            # Reading one end pops only that heap's stale entries, so the other one can be the larger
+            if max(len(self._min_heap), len(self._max_heap)) > 2 * len(self._cents_counts) + 64:
+                self._compact()
+
+    def _remove(self, cents, count):
+        self.total_cents -= cents * count
+        self.histogram[bisect_right(self._edge_cents, cents)] -= count
+        held = self._cents_counts.get(cents, 0) - count
+        if held > 0:
+            self._cents_counts[cents] = held
+        else:
+            self._cents_counts.pop(cents, None)
+
+    @property
+    def total(self):
+        return self.total_cents / 100
+
+    @property
+    def average(self):
+        """:return: Average balance, or None if the group is empty"""
+        return self.total_cents / 100 / self.count if self.count else None
+
+    @property
+    def min_balance(self):
+        """:return: Smallest balance, or None if the group is empty"""
+        heap = self._min_heap
+        while heap and heap[0] not in self._cents_counts:
+            heapq.heappop(heap)
+        return heap[0] / 100 if heap else None
+
+    @property
+    def max_balance(self):
+        """:return: Largest balance, or None if the group is empty"""
+        heap = self._max_heap
+        while heap and -heap[0] not in self._cents_counts:
+            heapq.heappop(heap)
+        return -heap[0] / 100 if heap else None
+
+    def count_at_least(self, threshold):
+        """
+        Count the accounts with a balance of at least threshold.
+
+        :param threshold: One of the bucket edges
+        :return: Number of accounts in the buckets from threshold upwards
+        """
+        position = bisect_left(self.bucket_edges, threshold)
+        if position == len(self.bucket_edges) or self.bucket_edges[position] != threshold:
+            raise ValueError(f"Threshold must be one of the histogram bucket edges: {self.bucket_edges}")
+        return sum(self.histogram[position + 1:])
+
+    def _compact(self):
+        # Drop every stale heap entry at once so the heaps stay proportional to the distinct balances
+        self._min_heap = list(self._cents_counts)
+        self._max_heap = [-cents for cents in self._cents_counts]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+
+class _CombinedAggregate(BalanceAggregate):
+    """
+    Aggregate over several groups that takes min and max from the groups
+    instead of counting every balance a second time.
+    """
+
+    def __init__(self, groups, bucket_edges=BALANCE_BUCKET_EDGES):
+        super().__init__(bucket_edges)
+        self._groups = groups  # Dict of the BalanceAggregates being combined; new ones may be added later
+
+    def _add(self, cents, count):
+        self.total_cents += cents * count
+        self.histogram[bisect_right(self._edge_cents, cents)] += count
+
+    def _remove(self, cents, count):
+        self.total_cents -= cents * count
+        self.histogram[bisect_right(self._edge_cents, cents)] -= count
+
+    @property
+    def min_balance(self):
+        return min((group.min_balance for group in self._groups.values() if group.count), default=None)
+
+    @property
+    def max_balance(self):
+        return max((group.max_balance for group in self._groups.values() if group.count), default=None)
+
+class AccountAggregates:
+    def __init__(self, bucket_edges=BALANCE_BUCKET_EDGES):
+        """
+        Balance aggregates for all accounts and per account type, kept up to date on every posting.
+
+        :param bucket_edges: Increasing lower edges of the histogram buckets
+        """
+        self.bucket_edges = tuple(bucket_edges)
+        self.by_type = {}  # account_type -> BalanceAggregate
+        self.overall = _CombinedAggregate(self.by_type, self.bucket_edges)
+
+    def set(self, account_type, old_balance, balance):
+        """
+        Add an account or record its new balance.
+
+        :param account_type: Type of the account
+        :param old_balance: Balance of the account before the posting (None for a new account)
+        :param balance: Current balance of the account
+        """
+        self.overall.set(old_balance, balance)
+        self._group(account_type).set(old_balance, balance)
+
+    def load(self, account_type, balance_cents, count):
+        """
+        Add existing accounts that all hold the same balance.
+
+        :param account_type: Type of the accounts
+        :param balance_cents: Balance of the accounts in cents
+        :param count: Number of accounts holding it
+        """
+        self.overall.load(balance_cents, count)
+        self._group(account_type).load(balance_cents, count)
+
+    def get(self, account_type=None):
+        """
+        :param account_type: Type of account (default is every account)
+        :return: BalanceAggregate of the accounts of that type (empty if there are none)
+        """
+        if account_type is None:
+            return self.overall
+        aggregate = self.by_type.get(account_type)
+        return aggregate if aggregate is not None else BalanceAggregate(self.bucket_edges)
+
+    def _group(self, account_type):
+        aggregate = self.by_type.get(account_type)
+        if aggregate is None:
+            aggregate = self.by_type[account_type] = BalanceAggregate(self.bucket_edges)
+        return aggregate
+
+class Bank:
+    ACCOUNT_FIELDS = ('account_id', 'name', 'contact_info', 'account_type', 'balance')
+    _FIELD_GETTERS = {
+        'account_id': lambda account_id, account: account_id,
+        'name': lambda account_id, account: account.user.name,
+        'contact_info': lambda account_id, account: account.user.contact_info,
+        'account_type': lambda account_id, account: account.account_type,
+        'balance': lambda account_id, account: account.balance,
+    }
+
+    def __init__(self, storage=None, summary_cache_size=1024):
+        """
+        Represents the banking system.
+
+        A Bank is not thread-safe. Postings read an account, change its balance
+        and write it back, and backends such as SQLiteStorage hand out a fresh
+        Account on every lookup, so two threads posting to the same account at
+        once would lose one of the updates. Callers that share a Bank between
+        threads must serialize every call, as banking_server.PartitionWorker
+        does with its lock.
+
+        :param storage: Storage backend holding the accounts (default is InMemoryStorage)
+        :param summary_cache_size: Maximum number of formatted account summaries kept in memory
+        """
+        self.storage = storage if storage is not None else InMemoryStorage()
+        self.posting_rules = []
+        self.summary_cache = AccountSummaryCache(summary_cache_size)
+        self.aggregates = AccountAggregates()
+        # Accounts a persistent backend already holds are counted once, up front
+        for account_type, balance_cents, count in self.storage.balance_counts():
+            self.aggregates.load(account_type, balance_cents, count)
+
+    def add_posting_rule(self, rule):
+        """
+        Add a rule that every deposit, withdrawal and transfer is checked against.
+
+        A rule provides check(operation, account_id, amount), which raises to reject
+        the posting, and record(operation, account_id, amount), which is called
+        once the posting has gone through. The operation is 'deposit', 'withdraw'
+        or 'transfer'; for transfers the account is the one money leaves.
+
+        :param rule: Rule object, e.g. banking_velocity.VelocityRule
+        """
+        self.posting_rules.append(rule)
+
+    @property
+    def accounts(self):
+        """Mapping of account ID to Account, as exposed by the storage backend."""
+        return self.storage.accounts
+
+    def create_account(self, name, contact_info, account_type, initial_balance):
+        if self.storage.has_email(contact_info):
+            logging.error("This email is already in use. Please use a different email.")
+            return None
+
+        user = User(name, contact_info)
+        account = Account(user, account_type, round(initial_balance, 2))
+        account_id = self.storage.add_account(account)
+        self.aggregates.set(account.account_type, None, account.balance)
+        logging.info(f"Account created for {name} with ID {account_id} and balance ${initial_balance:.2f}")
+        return account_id
+
+    def get_account(self, account_id):
+        return self.storage.get_account(account_id)
+
+    def deposit(self, account_id, amount):
+        """
+        Deposit an amount into an account and persist the new balance.
+
+        :param account_id: ID of the account to deposit into
+        :param amount: Amount to be deposited (must be positive)
+        """
+        account = self._require_account(account_id)
+        self._check_rules('deposit', account_id, amount)
+        old_balance = account.balance
+        account.deposit(amount)
+        self.storage.record_postings([(account_id, account.balance)])
+        self.summary_cache.invalidate(account_id)
+        self.aggregates.set(account.account_type, old_balance, account.balance)
+        self._record_rules('deposit', account_id, amount)
+
+    def withdraw(self, account_id, amount):
+        """
+        Withdraw an amount from an account and persist the new balance.
+
+        :param account_id: ID of the account to withdraw from
+        :param amount: Amount to be withdrawn (must be positive and less than or equal to balance)
+        """
+        account = self._require_account(account_id)
+        self._check_rules('withdraw', account_id, amount)
+        old_balance = account.balance
+        account.withdraw(amount)
+        self.storage.record_postings([(account_id, account.balance)])
+        self.summary_cache.invalidate(account_id)
+        self.aggregates.set(account.account_type, old_balance, account.balance)
+        self._record_rules('withdraw', account_id, amount)
+
+    def transfer(self, from_account_id, to_account_id, amount):
+        """
+        Transfer money between two accounts, persisting both legs together.
+
+        :param from_account_id: ID of the account to transfer money from
+        :param to_account_id: ID of the account to transfer money to
+        :param amount: Amount to transfer (must be positive and less than or equal to balance)
+        :return: True if the money was moved, False if the transfer was rejected
+        """
+        from_account = self._require_account(from_account_id)
+        to_account = self._require_account(to_account_id) if to_account_id != from_account_id else from_account
+        moved = 0 < amount <= from_account.balance
+        if moved:
+            self._check_rules('transfer', from_account_id, amount)
+        from_old_balance = from_account.balance
+        to_old_balance = to_account.balance
+        from_account.transfer(amount, to_account)
+        if not moved:
+            return False
+        self.storage.record_postings([(from_account_id, from_account.balance), (to_account_id, to_account.balance)])
+        self.summary_cache.invalidate(from_account_id)
+        self.summary_cache.invalidate(to_account_id)
+        self.aggregates.set(from_account.account_type, from_old_balance, from_account.balance)
+        if to_account is not from_account:
+            self.aggregates.set(to_account.account_type, to_old_balance, to_account.balance)
+        self._record_rules('transfer', from_account_id, amount)
+        return True
+
+    def transfer_many(self, transfers):
+        """
+        Apply a batch of transfers in order and persist all of their legs in one call.
+
+        Each transfer is accepted or rejected exactly as transfer() would, and
+        balances change by the same amounts in the same order, but the batch
+        skips the per-leg logging and hands the storage backend one set of
+        postings, so large batches (e.g. a payroll run) cost far less per
+        transfer. Where transfer() would raise, for a missing account or a
+        rejection by a posting rule, only that transfer fails and the
+        exception it would have raised takes its place in the results.
+
+        :param transfers: Iterable of (from_account_id, to_account_id, amount) tuples
+        :return: List with True for every transfer that moved money, False for every one whose amount was
+            turned down, and the exception transfer() would have raised for every other one
+        """
+        results = []
+        accounts = {}  # Accounts touched by the batch; backends may hand out a fresh copy on every lookup
+        old_balances = {}  # Balance of every posted account before the batch
+        postings = {}
+        for from_account_id, to_account_id, amount in transfers:
+            from_account = self._batch_account(accounts, from_account_id)
+            to_account = self._batch_account(accounts, to_account_id)
+            try:
+                # Checked in the same order as transfer(), so the same error is reported
+                if from_account is None:
+                    raise ValueError(f"Account {from_account_id} not found.")
+                if to_account is None:
+                    raise ValueError(f"Account {to_account_id} not found.")
+                if not 0 < amount <= from_account.balance:
+                    results.append(False)
+                    continue
+                self._check_rules('transfer', from_account_id, amount)
+            except (ValidationError, InsufficientFundsError, VelocityLimitError, ValueError) as e:
+                logging.error(f"Transfer from account {from_account_id} to {to_account_id}: {e}")
+                results.append(e)
+                continue
+
+            old_balances.setdefault(from_account_id, from_account.balance)
+            old_balances.setdefault(to_account_id, to_account.balance)
+            # The same steps as Account.withdraw followed by Account.deposit
+            amount_posted = round(amount, 2)
+            from_account.balance -= amount_posted
+            from_account.version += 1
+            to_account.balance += amount_posted
+            to_account.version += 1
+            postings[from_account_id] = from_account.balance
+            postings[to_account_id] = to_account.balance
+            self._record_rules('transfer', from_account_id, amount)
+            results.append(True)
+
+        self.storage.record_postings(list(postings.items()))
+        for account_id, balance in postings.items():
+            self.summary_cache.invalidate(account_id)
+            self.aggregates.set(accounts[account_id].account_type, old_balances[account_id], balance)
+        logging.info(f"Bulk transfer: {results.count(True)} of {len(results)} transfers completed.")
+        return results
+
+    def _batch_account(self, accounts, account_id):
+        account = accounts.get(account_id)
+        if account is None:
+            account = self.storage.get_account(account_id)
+            if account is not None:
+                accounts[account_id] = account
+        return account
+
+    def _check_rules(self, operation, account_id, amount):
+        for rule in self.posting_rules:
+            rule.check(operation, account_id, amount)
+
+    def _record_rules(self, operation, account_id, amount):
+        for rule in self.posting_rules:
+            rule.record(operation, account_id, amount)
+
+    def _require_account(self, account_id):
+        account = self.storage.get_account(account_id)
+        if account is None:
+            raise ValueError(f"Account {account_id} not found.")
+        return account
+
+    def account_summary(self, account_id, account=None):
+        """
+        Return the formatted summary of an account, served from the summary cache when it is current.
+
+        :param account_id: ID of the account
+        :param account: The Account, if the caller already has it (saves a storage lookup on a miss)
+        :return: AccountSummary of the account
+        """
+        summary = self.summary_cache.get(account_id)
+        if summary is None:
+            if account is None:
+                account = self._require_account(account_id)
+            summary = AccountSummary(account.balance, (
+                f"\nAccount ID: {account_id}",
+                f"Account Holder: {account.user.name}",
+                f"Account Type: {account.account_type}",
+                f"Balance: ${account.balance:.2f}",
+            ))
+            self.summary_cache.put(account_id, account, summary)
+        return summary
+
+    def compare_balance(self, account_id, other_account_id):
+        """
+        Compare the balances of two accounts using their cached summaries.
+
+        :param account_id: ID of the first account
+        :param other_account_id: ID of the account to compare with
+        :return: String indicating whether the first balance is 'larger', 'smaller', or 'equal'
+        """
+        balance = self.account_summary(account_id).balance
+        other_balance = self.account_summary(other_account_id).balance
+        if balance > other_balance:
+            return "larger than"
+        elif balance < other_balance:
+            return "smaller than"
+        return "equal to"
+
+    def display_account_details(self, account_id):
+        for line in self.account_summary(account_id).lines:
+            logging.info(line)
+
+    def display_all_accounts(self):
+        if not self.accounts:
+            logging.error("No accounts available.")
+        for account_id, account in self.storage.iter_accounts():
+            for line in self.account_summary(account_id, account).lines:
+                logging.info(line)
+
+    def iter_accounts(self, after_id=0, account_type=None, min_balance=None, max_balance=None, fields=None):
+        """
+        Lazily yield accounts in account ID order, filtered and projected.
+
+        Nothing is materialized up front, so a caller that stops early only pays
+        for the accounts it actually looked at.
+
+        :param after_id: Only yield accounts with an ID greater than this cursor
+        :param account_type: Only yield accounts of this type
+        :param min_balance: Only yield accounts with at least this balance
+        :param max_balance: Only yield accounts with at most this balance
+        :param fields: Names from ACCOUNT_FIELDS to include (default is all of them)
+        :return: Generator of dicts mapping each requested field to its value
+        """
+        fields = self._check_fields(fields)
+        for account_id, account in self._iter_matching(after_id, account_type, min_balance, max_balance):
+            yield self._project(account_id, account, fields)
+
+    def list_accounts(self, cursor=None, page_size=20, account_type=None, min_balance=None, max_balance=None, fields=None):
+        """
+        Return one page of accounts and the cursor for the next page.
+
+        :param cursor: Cursor returned by the previous call (None for the first page)
+        :param page_size: Maximum number of accounts on the page
+        :param account_type: Only include accounts of this type
+        :param min_balance: Only include accounts with at least this balance
+        :param max_balance: Only include accounts with at most this balance
+        :param fields: Names from ACCOUNT_FIELDS to include (default is all of them)
+        :return: Tuple of (list of account dicts, next cursor or None when exhausted)
+        """
+        fields = self._check_fields(fields)
+        accounts, next_cursor = self._page(cursor, page_size, account_type, min_balance, max_balance)
+        return [self._project(account_id, account, fields) for account_id, account in accounts], next_cursor
+
+    def display_accounts_page(self, cursor=None, page_size=20, account_type=None, min_balance=None, max_balance=None):
+        """
+        Log the details of one page of accounts.
+
+        :param cursor: Cursor returned by the previous call (None for the first page)
+        :param page_size: Maximum number of accounts to display
+        :param account_type: Only display accounts of this type
+        :param min_balance: Only display accounts with at least this balance
+        :param max_balance: Only display accounts with at most this balance
+        :return: Cursor for the next page, or None when there are no more accounts
+        """
+        accounts, next_cursor = self._page(cursor, page_size, account_type, min_balance, max_balance)
+        if not accounts and cursor is None:
+            logging.error("No accounts available.")
+        for account_id, account in accounts:
+            # The account is already loaded, so a cache miss does not look it up again
+            for line in self.account_summary(account_id, account).lines:
+                logging.info(line)
+        return next_cursor
+
+    def _page(self, cursor, page_size, account_type, min_balance, max_balance):
+        # One page of (account_id, account) pairs and the cursor for the next page
+        if page_size <= 0:
+            raise ValueError("Page size must be greater than zero.")
+        page = []
+        matching = self._iter_matching(cursor or 0, account_type, min_balance, max_balance)
+        for account_id, account in matching:
+            page.append((account_id, account))
+            if len(page) == page_size:
+                # Only hand out a cursor if another account matches, so the last page ends the listing
+                return page, account_id if next(matching, None) is not None else None
+        return page, None
+
+    def _iter_matching(self, after_id, account_type, min_balance, max_balance):
+        for account_id, account in self.storage.iter_accounts(after_id):
+            if account_type is not None and account.account_type != account_type:
+                continue
+            if min_balance is not None and account.balance < min_balance:
+                continue
+            if max_balance is not None and account.balance > max_balance:
+                continue
+            yield account_id, account
+
+    @classmethod
+    def _project(cls, account_id, account, fields):
+        return {field: cls._FIELD_GETTERS[field](account_id, account) for field in fields}
+
+    @classmethod
+    def _check_fields(cls, fields):
+        if fields is None:
+            return cls.ACCOUNT_FIELDS
+        fields = tuple(fields)
+        unknown = [field for field in fields if field not in cls._FIELD_GETTERS]
+        if unknown:
+            raise ValueError(f"Unknown account fields: {', '.join(unknown)}")
+        return fields
+
+class ValidationError(Exception):
+    """Exception raised for incorrect user inputs for withdraw/deposit amounts"""
+
+    def __init__(self, message, error_code=None):
+        super().__init__(message)
+        self.message = message
+        self.error_code = error_code
+
+    def __str__(self):
+        if self.error_code is None:
+            return self.message
+        return f"{self.message} (Error Code: {self.error_code})"
+    
+class InsufficientFundsError(Exception):
+    """Exception raised for insufficient funds in account for withdraw amounts"""
+
+    def __init__(self, message, error_code=None):
+        super().__init__(message)
+        self.message = message
+        self.error_code = error_code
+
+    def __str__(self):
+        if self.error_code is None:
+            return self.message
+        return f"{self.message} (Error Code: {self.error_code})"
+
+class VelocityLimitError(Exception):
+    """Exception raised when a posting would exceed an account's velocity limits"""
+
+    def __init__(self, message, error_code=None):
+        super().__init__(message)
+        self.message = message
+        self.error_code = error_code
+
+    def __str__(self):
+        if self.error_code is None:
+            return self.message
+        return f"{self.message} (Error Code: {self.error_code})"
@@ -0,0 +1,280 @@
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from banking import Bank, InsufficientFundsError, ValidationError, VelocityLimitError
+from banking_replay import EventLogWriter, replay
+from banking_storage import SQLiteStorage
+from banking_velocity import VelocityRule
+
+POSTING_ERRORS = (ValidationError, InsufficientFundsError, VelocityLimitError, ValueError)
+MISSING_ACCOUNTS = 2 # IDs past the last account that operations may use, to exercise "not found"
+VELOCITY_MAX_COUNT = 25 # Per-account posting limit when --velocity is on
+
+class DifferentialResult:
+    '''
+    The comparison of one alternative engine against the reference Bank.
+
+    Attributes:
+        engine (str): The name of the engine.
+        operation_count (int): The number of operations run.
+        reference_seconds (float): Time the reference Bank took.
+        engine_seconds (float): Time the engine took.
+        outcome_mismatches (list): (operation index, operation, reference outcome,
+            engine outcome) for every operation whose outcome differs, or None if
+            the engine does not report per-operation outcomes.
+        balance_mismatches (dict): Account ID -> (reference balance, engine balance)
+            for every account whose final balance differs.
+    '''
+
+    def __init__(self, engine, operation_count, reference_seconds, engine_seconds, outcome_mismatches,
+                 balance_mismatches):
+        self.engine = engine
+        self.operation_count = operation_count
+        self.reference_seconds = reference_seconds
+        self.engine_seconds = engine_seconds
+        self.outcome_mismatches = outcome_mismatches
+        self.balance_mismatches = balance_mismatches
+
+    @property
+    def equivalent(self):
+        return not self.outcome_mismatches and not self.balance_mismatches
+
+    @property
+    def speedup(self):
+        return self.reference_seconds / self.engine_seconds if self.engine_seconds else float('inf')
+
+def random_amount(rng, balance_hint):
+    '''Returns an amount biased towards the edge cases of the posting rules.'''
+    choice = rng.random()
+    if choice < 0.05:
+        return -rng.uniform(0, 100)
+    if choice < 0.08:
+        return 0
+    if choice < 0.15:
+        return rng.choice((0.001, 0.004, 0.005, 0.006, 0.015, 0.125))
+    if choice < 0.25:
+        return balance_hint
+    if choice < 0.35:
+        return rng.uniform(balance_hint, balance_hint * 3 + 1)
+    return rng.uniform(0.01, max(balance_hint, 1))
+
+def generate_workload(seed, account_count, operation_count):
+    '''
+    Generates opening balances and a random sequence of postings.
+
+    Returns:
+        tuple: The list of opening balances (the balance of account N is at index N-1) and a list
+        of ('deposit'|'withdraw', account_id, amount) and
+        ('transfer', from_account_id, to_account_id, amount) operations.
+    '''
+    rng = random.Random(seed)
+    balances = [round(rng.uniform(0, 1000), rng.choice((0, 2, 3))) for _ in range(account_count)]
+    operations = []
+    for _ in range(operation_count):
+        account_id = rng.randint(1, account_count + MISSING_ACCOUNTS)
+        amount = random_amount(rng, balances[(account_id - 1) % account_count])
+        kind = rng.random()
+        if kind < 0.3:
+            operations.append(('deposit', account_id, amount))
+        elif kind < 0.55:
+            operations.append(('withdraw', account_id, amount))
+        else:
+            operations.append(('transfer', account_id, rng.randint(1, account_count + MISSING_ACCOUNTS), amount))
+    return balances, operations
+
+def open_bank(balances, storage=None, velocity=False):
+    '''Creates a Bank holding one account per opening balance, with IDs 1..N.'''
+    bank = Bank(storage)
+    if velocity:
+        # A clock that never moves keeps the window identical however long each engine takes
+        bank.add_posting_rule(VelocityRule(max_count=VELOCITY_MAX_COUNT, clock=lambda: 0.0))
+    for n, balance in enumerate(balances, 1):
+        bank.create_account('Holder', f'holder{n}@example.com', 'Checking', balance)
+    return bank
+
+def outcome_of(bank, operation):
+    '''
+    Applies one operation and describes what happened.
+
+    Returns:
+        tuple: ('ok', None), ('rejected', None) for a transfer that returned
+        False, or ('error', 'ExceptionType: message').
+    '''
+    try:
+        if operation[0] == 'transfer':
+            moved = bank.transfer(*operation[1:])
+            return ('ok', None) if moved else ('rejected', None)
+        getattr(bank, operation[0])(*operation[1:])
+        return ('ok', None)
+    except POSTING_ERRORS as e:
+        return error_outcome(e)
+
+def error_outcome(error):
+    return ('error', f'{type(error).__name__}: {error}')
+
+def final_balances(bank):
+    return {account_id: account.balance for account_id, account in bank.storage.iter_accounts()}
+
+def run_reference(balances, operations, velocity):
+    '''Runs the operations one at a time through Bank backed by InMemoryStorage.'''
+    bank = open_bank(balances, velocity=velocity)
+    start = time.perf_counter()
+    outcomes = [outcome_of(bank, operation) for operation in operations]
+    seconds = time.perf_counter() - start
+    return outcomes, final_balances(bank), seconds
+
+def run_sqlite(balances, operations, velocity, temp_dir):
+    '''
+    Runs the operations through Bank backed by SQLiteStorage, then reopens the
+    database so the balances compared are the ones that were persisted.
+    '''
+    path = os.path.join(temp_dir, 'differential.db')
+    bank = open_bank(balances, SQLiteStorage(path), velocity)
+    start = time.perf_counter()
+    outcomes = [outcome_of(bank, operation) for operation in operations]
+    bank.storage.close()
+    seconds = time.perf_counter() - start
+    reopened = SQLiteStorage(path)
+    try:
+        return outcomes, final_balances(Bank(reopened)), seconds
+    finally:
+        reopened.close()
+
+def run_transfer_many(balances, operations, velocity, batch_size=1000):
+    '''
+    Runs consecutive transfers through Bank.transfer_many in batches; deposits
+    and withdrawals in between go through the ordinary methods.
+
+    transfer_many returns the exception a failed transfer would have raised
+    instead of raising it, so it is reported as the same ('error', ...) outcome.
+    '''
+    bank = open_bank(balances, velocity=velocity)
+    outcomes = []
+    start = time.perf_counter()
+    batch = []
+    for operation in operations + [None]:
+        if operation is not None and operation[0] == 'transfer' and len(batch) < batch_size:
+            batch.append(operation[1:])
+            continue
+        if batch:
+            for result in bank.transfer_many(batch):
+                if isinstance(result, Exception):
+                    outcomes.append(error_outcome(result))
+                else:
+                    outcomes.append(('ok', None) if result else ('rejected', None))
+            batch = []
+        if operation is None:
+            break
+        if operation[0] == 'transfer':
+            batch.append(operation[1:])
+        else:
+            outcomes.append(outcome_of(bank, operation))
+    seconds = time.perf_counter() - start
+    return outcomes, final_balances(bank), seconds
+
+def run_replay(balances, operations, reference_outcomes, temp_dir, workers):
+    '''
+    Writes the postings the reference accepted to an event log and rebuilds the
+    balances with banking_replay.replay. Only the replay itself is timed.
+    '''
+    path = os.path.join(temp_dir, 'differential.bev')
+    with EventLogWriter(path) as log:
+        for operation, (outcome, _) in zip(operations, reference_outcomes):
+            if outcome == 'ok':
+                getattr(log, operation[0])(*operation[1:])
+    opening = {n: round(balance, 2) for n, balance in enumerate(balances, 1)}
+    start = time.perf_counter()
+    replayed, _ = replay(path, opening, workers=workers)
+    return None, replayed, time.perf_counter() - start
+
+def compare(engine, operations, reference, candidate):
+    '''
+    Compares an engine's (outcomes, balances, seconds) against the reference's.
+
+    Returns:
+        DifferentialResult: The mismatches and timings.
+    '''
+    reference_outcomes, reference_balances, reference_seconds = reference
+    outcomes, balances, seconds = candidate
+    outcome_mismatches = None
+    if outcomes is not None:
+        outcome_mismatches = []
+        for index, (operation, expected, actual) in enumerate(zip(operations, reference_outcomes, outcomes)):
+            if expected != actual:
+                outcome_mismatches.append((index, operation, expected, actual))
+        if len(outcomes) != len(reference_outcomes):
+            outcome_mismatches.append((len(outcomes), None, len(reference_outcomes), len(outcomes)))
+    balance_mismatches = {account_id: (reference_balances.get(account_id), balances.get(account_id))
+                          for account_id in reference_balances.keys() | balances.keys()
+                          if reference_balances.get(account_id) != balances.get(account_id)}
+    return DifferentialResult(engine, len(operations), reference_seconds, seconds, outcome_mismatches,
+                              balance_mismatches)
+
+def run_differential(seed, account_count, operation_count, engines, velocity=False, replay_workers=2):
+    '''
+    Generates one workload and checks every requested engine against the reference Bank.
+
+    Args:
+        seed (int): Seed of the random workload.
+        account_count (int): Number of accounts opened before the operations run.
+        operation_count (int): Number of random operations.
+        engines (list): Names from ENGINES to check.
+        velocity (bool): Install the same VelocityRule on every Bank.
+        replay_workers (int): Worker processes for the parallel replay engine.
+
+    Returns:
+        list: One DifferentialResult per engine.
+    '''
+    balances, operations = generate_workload(seed, account_count, operation_count)
+    reference = run_reference(balances, operations, velocity)
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for engine in engines:
+            if engine == 'sqlite':
+                results.append(compare(engine, operations, reference,
+                                       run_sqlite(balances, operations, velocity, temp_dir)))
+            elif engine == 'transfer_many':
+                results.append(compare(engine, operations, reference,
+                                       run_transfer_many(balances, operations, velocity)))
+            elif engine == 'replay':
+                results.append(compare(engine, operations, reference,
+                                       run_replay(balances, operations, reference[0], temp_dir, 1)))
+            elif engine == 'replay_parallel':
+                results.append(compare(engine, operations, reference,
+                                       run_replay(balances, operations, reference[0], temp_dir, replay_workers)))
+            else:
+                raise ValueError(f'Unknown engine "{engine}".')
+    return results
+
+ENGINES = ('sqlite', 'transfer_many', 'replay', 'replay_parallel')
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Check alternative banking engines against the reference Bank.')
+    arg_parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    arg_parser.add_argument('--seeds', type=int, default=3, help='number of random workloads')
+    arg_parser.add_argument('--accounts', type=int, default=200)
+    arg_parser.add_argument('--operations', type=int, default=100000, help='operations per workload')
+    arg_parser.add_argument('--velocity', action='store_true', help='run every Bank with the same velocity rule')
+    args = arg_parser.parse_args()
+    logging.disable(logging.CRITICAL) # Every posting logs; leaving that on would time the logging
+
+    failed = False
+    print(f'{"seed":>4} {"engine":>16} {"reference s":>12} {"engine s":>9} {"speedup":>8}  result')
+    for seed in range(args.seeds):
+        for result in run_differential(seed, args.accounts, args.operations, args.engines, args.velocity):
+            if result.equivalent:
+                verdict = 'equivalent'
+            else:
+                failed = True
+                verdict = (f'{len(result.outcome_mismatches or ())} outcome and '
+                           f'{len(result.balance_mismatches)} balance mismatches')
+                if result.outcome_mismatches:
+                    verdict += f'; first: {result.outcome_mismatches[0]}'
+            print(f'{seed:>4} {result.engine:>16} {result.reference_seconds:12.3f} {result.engine_seconds:9.3f} '
+                  f'{result.speedup:7.2f}x  {verdict}')
+    sys.exit(1 if failed else 0)
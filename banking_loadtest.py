@@ -0,0 +1,117 @@
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from banking_server import BankClient
+
+INITIAL_BALANCE = 1000.0
+DEPOSIT_SHARE = 0.2 # The rest of the operations are transfers, which keep the total unchanged
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def start_server(workers, port, timeout=10):
+    """
+    Start banking_server.py in a subprocess and wait until every worker answers.
+
+    :param workers: Number of worker processes
+    :param port: Port to listen on
+    :param timeout: Seconds to wait for the server to come up
+    :return: The server's Popen object
+    """
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            'banking_server.py'),
+                               '--workers', str(workers), '--port', str(port)])
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # totals asks every partition, so it only succeeds once all workers are up
+            with BankClient(('127.0.0.1', port)) as client:
+                client.call('totals')
+            return server
+        except OSError:
+            if time.monotonic() > deadline or server.poll() is not None:
+                server.terminate()
+                raise RuntimeError(f"Server with {workers} workers did not start.")
+            time.sleep(0.05)
+
+def run_client(port, account_ids, duration, seed):
+    """
+    Send random deposits and transfers over one connection for a fixed time.
+
+    :return: Tuple of (operations completed, cents deposited)
+    """
+    rng = random.Random(seed)
+    operations = 0
+    deposited_cents = 0
+    with BankClient(('127.0.0.1', port)) as client:
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            amount = rng.randint(1, 10000) / 100
+            if rng.random() < DEPOSIT_SHARE:
+                client.call('deposit', account_id=rng.choice(account_ids), amount=amount)
+                deposited_cents += round(amount * 100)
+            else:
+                # A transfer the balance cannot cover comes back False, which is fine here
+                client.call('transfer', from_account_id=rng.choice(account_ids),
+                            to_account_id=rng.choice(account_ids), amount=amount)
+            operations += 1
+    return operations, deposited_cents
+
+def run_load(workers, clients, duration, account_count):
+    """
+    Measure the throughput of a server with the given number of workers.
+
+    The server is started fresh, filled with accounts and driven by client
+    processes; afterwards the total of all balances is checked against the
+    money that was deposited, so lost or duplicated postings are caught.
+
+    :return: Operations per second
+    """
+    port = free_port()
+    server = start_server(workers, port)
+    try:
+        with BankClient(('127.0.0.1', port)) as client:
+            account_ids = [client.call('create_account', name='Load', contact_info=f'load{n}@example.com',
+                                       account_type='Checking', initial_balance=INITIAL_BALANCE)
+                           for n in range(account_count)]
+            with multiprocessing.Pool(clients) as pool:
+                results = pool.starmap(run_client, [(port, account_ids, duration, seed) for seed in range(clients)])
+            totals = client.call('totals')
+    finally:
+        server.terminate()
+        server.wait()
+
+    operations = sum(result[0] for result in results)
+    expected_cents = account_count * round(INITIAL_BALANCE * 100) + sum(result[1] for result in results)
+    if totals['accounts'] != account_count or totals['total_cents'] != expected_cents:
+        raise AssertionError(f"{workers} workers: totals {totals} do not match {account_count} accounts "
+                             f"holding {expected_cents} cents")
+    return operations / duration
+
+if __name__ == '__main__':
+    cpus = os.cpu_count()
+    arg_parser = argparse.ArgumentParser(description='Measure how banking_server.py throughput scales with workers.')
+    arg_parser.add_argument('--workers', type=int, nargs='+',
+                            default=sorted({1, 2, 4, cpus} | {n for n in (8, 16) if n <= cpus}),
+                            help='worker counts to measure')
+    arg_parser.add_argument('--clients', type=int, default=None,
+                            help='concurrent client processes (default is twice the largest worker count)')
+    arg_parser.add_argument('--duration', type=float, default=5.0, help='seconds of load per worker count')
+    arg_parser.add_argument('--accounts', type=int, default=1000, help='number of accounts to spread load over')
+    args = arg_parser.parse_args()
+    clients = args.clients or 2 * max(args.workers)
+
+    print(f"{cpus} CPUs, {clients} client processes, {args.duration:.0f} s per run")
+    baseline = None
+    for workers in args.workers:
+        throughput = run_load(workers, clients, args.duration, args.accounts)
+        baseline = baseline or throughput
+        print(f"{workers:>3} workers: {throughput:10.0f} ops/s  {throughput / baseline:5.2f}x")
@@ -0,0 +1,73 @@
+import argparse
+import logging
+import multiprocessing
+import resource
+
+import banking
+from banking import Account, Bank, User
+
+FIRST_NAMES = ('Alice', 'Bob', 'Carol', 'David', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy')
+ACCOUNT_TYPES = ('Savings', 'Checking', 'Business')
+
+class DictUser:
+    '''User as it was before interning and __slots__: one __dict__ and its own strings per object.'''
+
+    def __init__(self, name, contact_info):
+        self.name = name
+        self.contact_info = contact_info
+
+class DictAccount:
+    '''Account as it was before interning and __slots__.'''
+
+    def __init__(self, user, account_type, balance=0):
+        self.user = user
+        self.account_type = account_type
+        self.balance = round(balance, 2)
+        self.version = 0
+
+    deposit = Account.deposit
+    withdraw = Account.withdraw
+
+VARIANTS = {'before': (DictUser, DictAccount), 'after': (User, Account)}
+
+def build_bank(variant, account_count):
+    '''
+    Opens account_count accounts in an in-memory Bank, makes one deposit into
+    each, and returns how much the process grew in bytes. That covers
+    everything the Bank keeps per account: the storage dict, the registered
+    emails and the balance aggregates.
+
+    Every string is decoded afresh, as it would be when read from input, a
+    database or the network, so identical values start out as separate objects.
+    Balances are spread over millions of distinct cent values, the expensive
+    case for the aggregates.
+    '''
+    # Bank.create_account looks the classes up in its module on every call
+    banking.User, banking.Account = VARIANTS[variant]
+    logging.disable(logging.CRITICAL)
+    start_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    bank = Bank()
+    for n in range(1, account_count + 1):
+        name = FIRST_NAMES[n % len(FIRST_NAMES)].encode().decode()
+        account_type = ACCOUNT_TYPES[n % len(ACCOUNT_TYPES)].encode().decode()
+        bank.create_account(name, f'user{n}@example.com', account_type, n % 1000 + 0.5)
+    for n in range(1, account_count + 1):
+        bank.deposit(n, n * 7919 % 10000000 / 100 + 0.01)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_kb) * 1024
+
+def bytes_per_account(variant, account_count):
+    # A fresh process per variant, so the peak RSS it reports belongs to that variant alone
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(build_bank, (variant, account_count)) / account_count
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the memory a Bank uses per account before and after interning and __slots__.')
+    arg_parser.add_argument('--accounts', type=int, default=1000000,
+                            help='accounts to open per variant (10M needs several GB of memory)')
+    args = arg_parser.parse_args()
+
+    results = {variant: bytes_per_account(variant, args.accounts) for variant in VARIANTS}
+    for variant, per_account in results.items():
+        print(f'{variant:>6}: {per_account:6.0f} bytes per account  '
+              f'({per_account * args.accounts / 2 ** 30:.2f} GiB for {args.accounts} accounts)')
+    print(f' saved: {1 - results["after"] / results["before"]:.0%}')
@@ -0,0 +1,224 @@
+import heapq
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# Statements are kept as constants so the connection reuses its compiled copies
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS scheduled_transfers (
+        order_id INTEGER PRIMARY KEY,
+        from_account_id INTEGER NOT NULL,
+        to_account_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        due_time REAL NOT NULL,
+        interval REAL
+    )
+'''
+INSERT_ORDER_SQL = ('INSERT INTO scheduled_transfers (order_id, from_account_id, to_account_id, amount, due_time, '
+                    'interval) VALUES (?, ?, ?, ?, ?, ?)')
+SELECT_ORDERS_SQL = 'SELECT order_id, from_account_id, to_account_id, amount, due_time, interval FROM scheduled_transfers'
+MAX_ORDER_ID_SQL = 'SELECT MAX(order_id) FROM scheduled_transfers'
+UPDATE_DUE_TIME_SQL = 'UPDATE scheduled_transfers SET due_time = ? WHERE order_id = ?'
+DELETE_ORDER_SQL = 'DELETE FROM scheduled_transfers WHERE order_id = ?'
+
+
+class TransferScheduler:
+    def __init__(self, bank, path=':memory:', batch_size=10000, clock=time.time):
+        """
+        Future-dated and recurring transfers (standing orders, payroll) released through Bank.transfer_many.
+
+        Orders wait in a min-heap keyed by due time, so scheduling, cancelling
+        and releasing an order are O(log n). Cancelled and rescheduled orders
+        leave stale heap entries behind that are skipped when they reach the
+        top. Every order is also stored in a SQLite table, and a scheduler
+        opened on the same file after a restart picks the queue up again.
+
+        Each batch's schedule changes are committed before its transfers are
+        released. A crash in between therefore never pays an order twice; the
+        orders of the interrupted batch miss that one occurrence instead.
+
+        :param bank: Bank the transfers are made in
+        :param path: Path of the SQLite file holding the queue (default keeps it in memory only)
+        :param batch_size: Maximum number of transfers released per Bank.transfer_many call
+        :param clock: Function returning the current time in seconds since the epoch
+        """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be greater than zero.")
+        self.bank = bank
+        self.batch_size = batch_size
+        self.clock = clock
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        if path != ':memory:':
+            self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(CREATE_TABLE_SQL)
+        # order_id -> (from_account_id, to_account_id, amount, due_time, interval)
+        self._orders = {row[0]: row[1:] for row in self._connection.execute(SELECT_ORDERS_SQL)}
+        self._heap = [(order[3], order_id) for order_id, order in self._orders.items()]
+        heapq.heapify(self._heap)
+        self._next_order_id = (self._connection.execute(MAX_ORDER_ID_SQL).fetchone()[0] or 0) + 1
+
+    def schedule(self, from_account_id, to_account_id, amount, due_time, interval=None):
+        """
+        Schedule one transfer.
+
+        :param from_account_id: ID of the account to transfer money from
+        :param to_account_id: ID of the account to transfer money to
+        :param amount: Amount to transfer each time the order is due
+        :param due_time: Time the first transfer is due, in seconds since the epoch
+        :param interval: Seconds between repeats of a standing order (None for a one-off transfer)
+        :return: ID of the new order
+        """
+        return self.schedule_many([(from_account_id, to_account_id, amount, due_time, interval)])[0]
+
+    def schedule_many(self, orders):
+        """
+        Schedule many transfers in a single database transaction.
+
+        :param orders: Iterable of (from_account_id, to_account_id, amount, due_time, interval) tuples
+        :return: List of the new order IDs, in the same order
+        """
+        rows = []
+        for from_account_id, to_account_id, amount, due_time, interval in orders:
+            if amount <= 0:
+                raise ValueError("Transfer amount must be greater than zero.")
+            if interval is not None and interval <= 0:
+                raise ValueError("Repeat interval must be greater than zero.")
+            rows.append((self._next_order_id + len(rows), from_account_id, to_account_id, amount, due_time, interval))
+        self._write(INSERT_ORDER_SQL, rows)
+        self._next_order_id += len(rows)
+        for order_id, *order in rows:
+            self._orders[order_id] = tuple(order)
+            heapq.heappush(self._heap, (order[3], order_id))
+        return [row[0] for row in rows]
+
+    def cancel(self, order_id):
+        """
+        :param order_id: ID of the order to cancel
+        :return: True if the order was pending, False if there was no such order
+        """
+        if self._orders.pop(order_id, None) is None:
+            return False
+        self._write(DELETE_ORDER_SQL, [(order_id,)])
+        return True
+
+    def next_due_time(self):
+        """:return: Due time of the earliest pending order, or None if nothing is scheduled"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now=None):
+        """
+        Release every transfer that is due, in due-time order, in batches of batch_size.
+
+        A standing order that fell behind (e.g. while the scheduler was down)
+        is paid once and then moves to its next due time after now, rather
+        than paying every occurrence it missed.
+
+        :param now: Current time in seconds since the epoch (default is the scheduler's clock)
+        :return: Tuple of (number of transfers released, number that moved money)
+        """
+        now = self.clock() if now is None else now
+        released = moved = 0
+        while True:
+            batch = self._pop_due(now)
+            if not batch:
+                return released, moved
+            try:
+                results = self.bank.transfer_many([self._orders[order_id][:3] for order_id in batch])
+            finally:
+                # The next due times are already committed, so the orders must go back on the heap even if
+                # the batch raised; otherwise standing orders would stay pending but never come due again.
+                for order_id in batch:
+                    order = self._orders[order_id]
+                    if order[4] is None:
+                        del self._orders[order_id]
+                    else:
+                        heapq.heappush(self._heap, (order[3], order_id))
+            released += len(batch)
+            moved += results.count(True)
+            failed = len(results) - results.count(True)
+            if failed:
+                logging.error(f"{failed} scheduled transfers were rejected.")
+
+    def _pop_due(self, now):
+        # Takes up to batch_size due orders off the heap and commits their next due times
+        batch = []
+        updates = []
+        deletes = []
+        while len(batch) < self.batch_size:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            due_time, order_id = heapq.heappop(self._heap)
+            from_account_id, to_account_id, amount, _, interval = self._orders[order_id]
+            if interval is None:
+                deletes.append((order_id,))
+            else:
+                missed = int((now - due_time) // interval)
+                due_time += (missed + 1) * interval
+                self._orders[order_id] = (from_account_id, to_account_id, amount, due_time, interval)
+                updates.append((due_time, order_id))
+            batch.append(order_id)
+        if batch:
+            with self._transaction() as connection:
+                connection.executemany(UPDATE_DUE_TIME_SQL, updates)
+                connection.executemany(DELETE_ORDER_SQL, deletes)
+        return batch
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap:
+            order = self._orders.get(heap[0][1])
+            if order is not None and order[3] == heap[0][0]:
+                return
+            heapq.heappop(heap)
+
+    def _write(self, sql, rows):
+        with self._transaction() as connection:
+            connection.executemany(sql, rows)
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection
+        connection.execute('BEGIN')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def __len__(self):
+        return len(self._orders)
+
+    def close(self):
+        self._connection.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from banking import Bank
+
+    arg_parser = argparse.ArgumentParser(description='Time a payroll run of scheduled transfers.')
+    arg_parser.add_argument('--orders', type=int, default=100000, help='number of employees paid')
+    arg_parser.add_argument('--batch-size', type=int, default=10000, help='transfers per bulk transfer call')
+    arg_parser.add_argument('--path', default=':memory:', help='SQLite file for the queue')
+    args = arg_parser.parse_args()
+
+    bank = Bank()
+    employer_id = bank.create_account('Employer', 'payroll@example.com', 'Business', 10.0 * args.orders)
+    employee_ids = [bank.create_account('Employee', f'employee{n}@example.com', 'Checking', 0)
+                    for n in range(args.orders)]
+    scheduler = TransferScheduler(bank, args.path, args.batch_size)
+    payday = time.time()
+
+    start = time.perf_counter()
+    scheduler.schedule_many((employer_id, employee_id, 10.0, payday, 30 * 86400) for employee_id in employee_ids)
+    scheduled = time.perf_counter()
+    released, moved = scheduler.run_due(payday)
+    finished = time.perf_counter()
+    scheduler.close()
+    print(f"Scheduled {args.orders} standing orders in {scheduled - start:.2f} s; released {released} "
+          f"({moved} paid) in {finished - scheduled:.2f} s ({released / (finished - scheduled):.0f} transfers/s)")
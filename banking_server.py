@@ -0,0 +1,565 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import socketserver
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+from banking import Bank, InMemoryStorage, InsufficientFundsError, ValidationError, VelocityLimitError
+from banking_storage import SQLiteStorage
+
+INSERT_ACCOUNT_WITH_ID_SQL = ('INSERT INTO accounts (account_id, name, contact_info, account_type, balance) '
+                              'VALUES (?, ?, ?, ?, ?)')
+MAX_ACCOUNT_ID_SQL = 'SELECT MAX(account_id) FROM accounts'
+CREATE_CREDITS_TABLE_SQL = 'CREATE TABLE IF NOT EXISTS credited_transfers (transfer_id TEXT PRIMARY KEY)'
+INSERT_CREDIT_SQL = 'INSERT INTO credited_transfers (transfer_id) VALUES (?)'
+SELECT_CREDIT_SQL = 'SELECT 1 FROM credited_transfers WHERE transfer_id = ?'
+RESTART_DELAY = 1.0 # Seconds to wait before restarting a worker that crashed right after starting
+IN_DOUBT_RETRY_DELAY = 0.5 # Seconds between attempts to deliver a transfer whose outcome is unknown
+IN_DOUBT_TIMEOUT = 10.0 # Seconds a client waits on an in-doubt transfer before it is left to a background thread
+ERROR_TYPES = {error_type.__name__: error_type
+               for error_type in (ValidationError, InsufficientFundsError, VelocityLimitError, ValueError)}
+
+def partition_for_account(account_id, partitions):
+    """
+    :param account_id: ID of the account
+    :param partitions: Number of partitions
+    :return: Index of the partition that owns the account
+    """
+    return (account_id - 1) % partitions
+
+def partition_for_email(email, partitions):
+    """
+    New accounts are created by the partition their email hashes to, which is
+    also the partition that checks the email is not already registered.
+
+    :param email: Email address of the new account
+    :param partitions: Number of partitions
+    :return: Index of the partition that creates the account
+    """
+    return zlib.crc32(email.encode()) % partitions
+
+class PartitionStorage(InMemoryStorage):
+    def __init__(self, partition, partitions, state_path=None):
+        """
+        In-memory storage for one partition, handing out the IDs partition + 1, partition + 1 + partitions, ...
+
+        The accounts are lost when the process dies, but the next account ID is
+        saved to state_path, so a restarted partition never hands out an ID a
+        client may still hold for one of the lost accounts.
+
+        :param partition: Index of the partition
+        :param partitions: Number of partitions
+        :param state_path: File the next account ID is kept in (default is not to keep it)
+        """
+        super().__init__()
+        self.partitions = partitions
+        self.first_account_id = partition + 1
+        self.next_account_id = self.first_account_id
+        self.state_path = state_path
+        self.credited_transfers = set()
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path) as state_file:
+                self.next_account_id = int(state_file.read())
+
+    def add_account(self, account):
+        account_id = self.next_account_id
+        self.accounts[account_id] = account
+        self.registered_emails.add(account.user.contact_info)
+        self.next_account_id += self.partitions
+        if self.state_path is not None:
+            # Replaced in one step, so a crash mid-write leaves the previous ID rather than a torn file
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w') as state_file:
+                state_file.write(str(self.next_account_id))
+            os.replace(temp_path, self.state_path)
+        return account_id
+
+    def is_credited(self, transfer_id):
+        """
+        :param transfer_id: ID of a cross-partition transfer
+        :return: Whether this partition already credited the transfer
+        """
+        return transfer_id in self.credited_transfers
+
+    def note_credit(self, transfer_id):
+        """
+        Record that the deposit about to be posted credits the transfer.
+
+        :param transfer_id: ID of a cross-partition transfer
+        """
+        self.credited_transfers.add(transfer_id)
+
+    def discard_credit(self, transfer_id):
+        """
+        Forget a noted credit whose deposit failed.
+
+        :param transfer_id: ID of a cross-partition transfer
+        """
+        self.credited_transfers.discard(transfer_id)
+
+    def iter_accounts(self, after_id=0):
+        start_id = self.first_account_id
+        if after_id >= start_id:
+            start_id += ((after_id - start_id) // self.partitions + 1) * self.partitions
+        for account_id in range(start_id, self.next_account_id, self.partitions):
+            account = self.accounts.get(account_id)
+            if account is not None:
+                yield account_id, account
+
+class PartitionedSQLiteStorage(SQLiteStorage):
+    def __init__(self, path, partition, partitions, **options):
+        """
+        SQLite storage for one partition, handing out the same IDs as PartitionStorage.
+
+        :param path: Path of the partition's database file
+        :param partition: Index of the partition
+        :param partitions: Number of partitions
+        :param options: Further SQLiteStorage options
+        """
+        super().__init__(path, **options)
+        self.partitions = partitions
+        with self._connection() as connection:
+            connection.execute(CREATE_CREDITS_TABLE_SQL)
+            last_id = connection.execute(MAX_ACCOUNT_ID_SQL).fetchone()[0]
+        self.next_account_id = partition + 1 if last_id is None else last_id + partitions
+        self._id_lock = threading.Lock()
+        self._unwritten_credits = set()  # Transfer IDs committed with the next batch of postings
+        self._committing_credits = set()
+
+    def add_account(self, account):
+        user = account.user
+        with self._id_lock:
+            account_id = self.next_account_id
+            with self._connection() as connection:
+                connection.execute(INSERT_ACCOUNT_WITH_ID_SQL, (account_id, user.name, user.contact_info,
+                                                                account.account_type, account.balance))
+            self.next_account_id += self.partitions
+        return account_id
+
+    def is_credited(self, transfer_id):
+        if transfer_id in self._unwritten_credits:
+            return True
+        with self._connection() as connection:
+            return connection.execute(SELECT_CREDIT_SQL, (transfer_id,)).fetchone() is not None
+
+    def note_credit(self, transfer_id):
+        # Written in the same transaction as the deposit's posting, so a crash keeps both or neither
+        self._unwritten_credits.add(transfer_id)
+
+    def discard_credit(self, transfer_id):
+        self._unwritten_credits.discard(transfer_id)
+
+    def _commit(self, batch):
+        self._committing_credits, self._unwritten_credits = self._unwritten_credits, set()
+        try:
+            super()._commit(batch)
+        except sqlite3.Error:
+            self._unwritten_credits |= self._committing_credits
+            raise
+        finally:
+            self._committing_credits = set()
+
+    def _write_batch(self, connection, batch):
+        super()._write_batch(connection, batch)
+        connection.executemany(INSERT_CREDIT_SQL, [(transfer_id,) for transfer_id in self._committing_credits])
+
+class RemoteError(Exception):
+    """Exception raised by BankClient for a server-side error that has no local exception type"""
+
+    def __init__(self, message, error_code=None):
+        super().__init__(message)
+        self.message = message
+        self.error_code = error_code
+
+    def __str__(self):
+        if self.error_code is None:
+            return self.message
+        return f"{self.message} (Error Code: {self.error_code})"
+
+# What BankClient.call raises when the server answered with an error, as opposed
+# to OSError when the request or its response was lost on the way
+ERROR_RESPONSES = (*ERROR_TYPES.values(), RemoteError)
+
+class BankClient:
+    def __init__(self, address):
+        """
+        Client for the newline-delimited JSON protocol spoken by the server and its workers.
+
+        Each request is one JSON object {"op": ..., **arguments} on a line; each
+        response is {"ok": true, "result": ...} or {"ok": false, "error": ...,
+        "error_type": ...} on a line.
+
+        :param address: (host, port) of the server, or the path of a worker's Unix socket
+        """
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(address)
+        except OSError:
+            self._socket.close()
+            raise
+        if family == socket.AF_INET:
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('rb')
+
+    def call(self, op, **arguments):
+        """
+        Send one request and wait for its response.
+
+        :param op: Name of the operation, e.g. 'deposit'
+        :param arguments: Arguments of the operation
+        :return: The result of the operation
+        """
+        self._socket.sendall(json.dumps({'op': op, **arguments}).encode() + b'\n')
+        line = self._reader.readline()
+        if not line.endswith(b'\n'):
+            raise ConnectionError("Server closed the connection.")
+        response = json.loads(line)
+        if response['ok']:
+            return response['result']
+        raise ERROR_TYPES.get(response['error_type'], RemoteError)(response['error'])
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                result = self.server.worker.dispatch(json.loads(line))
+                response = {'ok': True, 'result': result}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e), 'error_type': type(e).__name__}
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+
+class _ClientServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+
+    def __init__(self, listen_socket, worker):
+        # The listening socket is created by the supervisor and shared by every worker
+        super().__init__(listen_socket.getsockname(), _RequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listen_socket
+        self.worker = worker
+
+class _PeerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, worker):
+        super().__init__(path, _RequestHandler)
+        self.worker = worker
+
+class PartitionWorker:
+    def __init__(self, partition, partitions, socket_dir, storage):
+        """
+        Serves the accounts of one partition and forwards everything else to the partition that owns it.
+
+        Requests arrive from clients on the shared TCP socket and from other
+        workers on this worker's Unix socket. The Bank is only touched under a
+        lock, and the lock is never held while waiting on another worker, so
+        transfers running in opposite directions cannot deadlock.
+
+        :param partition: Index of the partition this worker owns
+        :param partitions: Number of partitions
+        :param socket_dir: Directory holding every worker's Unix socket
+        :param storage: Storage backend for this partition's accounts
+        """
+        self.partition = partition
+        self.partitions = partitions
+        self.socket_dir = socket_dir
+        self.bank = Bank(storage)
+        self._lock = threading.Lock()
+        self._peers = threading.local()  # Each handler thread keeps its own connections to the other workers
+
+    def dispatch(self, request):
+        """
+        Run a request here if this partition owns it, otherwise forward it to the owner.
+
+        :param request: Dict with the operation name under 'op' and its arguments
+        :return: The result of the operation
+        """
+        op = request.pop('op')
+        if op == 'totals':
+            return self._totals()
+        if op == 'partition_totals':
+            return self._partition_totals()
+        if op == 'create_account':
+            owner = partition_for_email(request['contact_info'], self.partitions)
+        elif op == 'transfer':
+            owner = partition_for_account(request['from_account_id'], self.partitions)
+        elif op in ('deposit', 'withdraw', 'balance', 'credit'):
+            owner = partition_for_account(request['account_id'], self.partitions)
+        else:
+            raise ValueError(f"Unknown operation {op!r}.")
+        if owner != self.partition:
+            return self._call_peer(owner, op, **request)
+        if op == 'transfer':
+            return self._transfer(**request)
+        if op == 'credit':
+            return self._credit(**request)
+        with self._lock:
+            if op == 'balance':
+                return self._account(request['account_id']).balance
+            return getattr(self.bank, op)(**request)
+
+    def _account(self, account_id):
+        account = self.bank.get_account(account_id)
+        if account is None:
+            raise ValueError(f"Account {account_id} not found.")
+        return account
+
+    def _transfer(self, from_account_id, to_account_id, amount):
+        to_owner = partition_for_account(to_account_id, self.partitions)
+        with self._lock:
+            # Turned down here rather than in Bank.transfer, which would log an error for every one
+            if not 0 < amount <= self._account(from_account_id).balance:
+                return False
+            if to_owner == self.partition:
+                return self.bank.transfer(from_account_id, to_account_id, amount)
+            # The two legs live in different processes: take the money out here,
+            # then credit it with the owner of the target account under an ID
+            # the owner applies only once.
+            self.bank.withdraw(from_account_id, amount)
+        transfer_id = uuid.uuid4().hex
+        if self._deliver_credit(from_account_id, to_owner, to_account_id, amount, transfer_id, IN_DOUBT_TIMEOUT):
+            return True
+        threading.Thread(target=self._resolve_in_doubt,
+                         args=(from_account_id, to_owner, to_account_id, amount, transfer_id), daemon=True).start()
+        raise RemoteError(f"Transfer {transfer_id} is in doubt: partition {to_owner} did not answer. "
+                          f"It will be completed, or refunded if the partition turns it down.")
+
+    def _deliver_credit(self, from_account_id, to_owner, to_account_id, amount, transfer_id, timeout=None):
+        """
+        Credit a cross-partition transfer with the target's owner, refunding it only if the owner turns it down.
+
+        A lost request or response says nothing about whether the credit was
+        posted, so the same transfer ID is sent again until the owner answers.
+
+        :param from_account_id: ID of the account the money was withdrawn from
+        :param to_owner: Partition that owns the target account
+        :param to_account_id: ID of the target account
+        :param amount: Amount withdrawn
+        :param transfer_id: ID the owner uses to apply the credit only once
+        :param timeout: Seconds to keep trying (default is to try until the owner answers)
+        :return: True once credited, False if the owner did not answer in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                self._call_peer(to_owner, 'credit', account_id=to_account_id, amount=amount, transfer_id=transfer_id)
+                return True
+            except ERROR_RESPONSES:
+                with self._lock:
+                    self.bank.deposit(from_account_id, amount)
+                raise
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                time.sleep(IN_DOUBT_RETRY_DELAY)
+
+    def _resolve_in_doubt(self, from_account_id, to_owner, to_account_id, amount, transfer_id):
+        try:
+            self._deliver_credit(from_account_id, to_owner, to_account_id, amount, transfer_id)
+        except ERROR_RESPONSES as e:
+            logging.error(f"Transfer {transfer_id} was turned down by partition {to_owner} and refunded: {e}")
+
+    def _credit(self, account_id, amount, transfer_id):
+        storage = self.bank.storage
+        with self._lock:
+            if storage.is_credited(transfer_id):
+                return True  # Sent again because the response to an earlier attempt was lost
+            storage.note_credit(transfer_id)
+            try:
+                self.bank.deposit(account_id, amount)
+            except Exception:
+                storage.discard_credit(transfer_id)
+                raise
+            return True
+
+    def _partition_totals(self):
+        with self._lock:
+            aggregate = self.bank.aggregates.get()
+            return {'accounts': aggregate.count, 'total_cents': aggregate.total_cents}
+
+    def _totals(self):
+        totals = {'accounts': 0, 'total_cents': 0}
+        for partition in range(self.partitions):
+            if partition == self.partition:
+                partition_totals = self._partition_totals()
+            else:
+                partition_totals = self._call_peer(partition, 'partition_totals')
+            totals['accounts'] += partition_totals['accounts']
+            totals['total_cents'] += partition_totals['total_cents']
+        return totals
+
+    def _call_peer(self, partition, op, **arguments):
+        clients = getattr(self._peers, 'clients', None)
+        if clients is None:
+            clients = self._peers.clients = {}
+        client = clients.get(partition)
+        try:
+            if client is None:
+                client = clients[partition] = BankClient(worker_socket_path(self.socket_dir, partition))
+            return client.call(op, **arguments)
+        except OSError:
+            # The peer went away (e.g. it is being restarted); reconnect on the next call
+            if clients.pop(partition, None) is not None:
+                client.close()
+            raise
+
+    def serve_forever(self, listen_socket):
+        """
+        Serve clients on the shared listening socket and peers on this worker's Unix socket until killed.
+
+        :param listen_socket: Non-blocking listening socket shared with the other workers
+        """
+        peer_path = worker_socket_path(self.socket_dir, self.partition)
+        if os.path.exists(peer_path):
+            os.remove(peer_path)  # Left behind by the crashed worker this one replaces
+        peer_server = _PeerServer(peer_path, self)
+        threading.Thread(target=peer_server.serve_forever, daemon=True).start()
+        try:
+            _ClientServer(listen_socket, self).serve_forever()
+        finally:
+            peer_server.shutdown()
+            self.bank.storage.close()
+
+def worker_socket_path(socket_dir, partition):
+    return os.path.join(socket_dir, f'worker-{partition}.sock')
+
+class BankServer:
+    def __init__(self, host='127.0.0.1', port=8765, workers=None, data_dir=None, log_postings=False):
+        """
+        Pre-forking server: a supervisor process binds one listening socket and forks a worker per partition.
+
+        Every worker accepts connections on the shared socket, so the kernel
+        spreads clients across them, and each worker owns the accounts whose
+        ID falls in its partition. A worker that dies is restarted with the
+        same partition. Without data_dir, partitions live in memory and a
+        restarted worker starts out empty, but never reuses the IDs of the
+        accounts it lost; with it, each partition is a SQLite file that a
+        restarted worker picks up again.
+
+        :param host: Address to listen on
+        :param port: Port to listen on (0 picks a free port)
+        :param workers: Number of worker processes (default is one per CPU)
+        :param data_dir: Directory for the partitions' SQLite files (default is to keep them in memory)
+        :param log_postings: Let workers log every account creation and posting
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count()
+        self.data_dir = data_dir
+        self.log_postings = log_postings
+        self._pids = {}  # pid -> partition
+        self._stopping = False
+
+    def serve_forever(self):
+        """Start the workers and keep restarting any that exit until SIGTERM or SIGINT."""
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listen_socket.bind((self.host, self.port))
+        listen_socket.listen(1024)
+        # Several workers wait on the same socket; the ones that lose the race
+        # for a connection must get EAGAIN instead of blocking in accept().
+        listen_socket.setblocking(False)
+        self.port = listen_socket.getsockname()[1]
+        socket_dir = tempfile.mkdtemp(prefix='bank-workers-')
+        if self.data_dir is not None:
+            os.makedirs(self.data_dir, exist_ok=True)
+
+        previous_handlers = {signum: signal.signal(signum, self._stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        logging.info(f"Listening on {self.host}:{self.port} with {self.workers} workers")
+        try:
+            started = {}
+            for partition in range(self.workers):
+                started[partition] = self._fork_worker(partition, listen_socket, socket_dir)
+            while True:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                partition = self._pids.pop(pid, None)
+                if partition is None or self._stopping:
+                    continue
+                logging.error(f"Worker {partition} (pid {pid}) exited with status {status}; restarting it")
+                if time.monotonic() - started[partition] < RESTART_DELAY:
+                    time.sleep(RESTART_DELAY)
+                started[partition] = self._fork_worker(partition, listen_socket, socket_dir)
+        finally:
+            self._stop_workers()
+            for pid in self._pids:
+                os.waitpid(pid, 0)
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            listen_socket.close()
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+    def _stop(self, signum, frame):
+        # The workers exit on SIGTERM and os.wait() then runs out of children
+        self._stopping = True
+        self._stop_workers()
+
+    def _stop_workers(self):
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _fork_worker(self, partition, listen_socket, socket_dir):
+        pid = os.fork()
+        if pid:
+            self._pids[pid] = partition
+            return time.monotonic()
+
+        # Worker process: never returns into the supervisor's code
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            if not self.log_postings:
+                logging.getLogger().setLevel(logging.WARNING)
+            if self.data_dir is None:
+                storage = PartitionStorage(partition, self.workers,
+                                           os.path.join(socket_dir, f'partition-{partition}.next-id'))
+            else:
+                # Commit every posting so a crashed worker loses nothing
+                storage = PartitionedSQLiteStorage(os.path.join(self.data_dir, f'partition-{partition}.db'),
+                                                   partition, self.workers, batch_size=1)
+            PartitionWorker(partition, self.workers, socket_dir, storage).serve_forever(listen_socket)
+        except SystemExit as e:
+            exit_code = e.code or 0
+        except BaseException:
+            logging.exception(f"Worker {partition} crashed")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Serve a partitioned Bank from pre-forked worker processes.')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (partitions)')
+    arg_parser.add_argument('--data-dir', help='keep each partition in a SQLite file in this directory')
+    arg_parser.add_argument('--verbose', action='store_true', help='log every posting')
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    BankServer(args.host, args.port, args.workers, args.data_dir, args.verbose).serve_forever()
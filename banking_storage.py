@@ -0,0 +1,188 @@
+import queue
+import sqlite3
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+from banking import Account, StorageBackend, User
+
+# Statements are kept as constants so every connection reuses its compiled copy
+# from sqlite3's per-connection statement cache instead of re-preparing them.
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS accounts (
+        account_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        contact_info TEXT NOT NULL UNIQUE,
+        account_type TEXT NOT NULL,
+        balance REAL NOT NULL
+    )
+'''
+INSERT_ACCOUNT_SQL = 'INSERT INTO accounts (name, contact_info, account_type, balance) VALUES (?, ?, ?, ?)'
+SELECT_ACCOUNT_SQL = 'SELECT name, contact_info, account_type, balance FROM accounts WHERE account_id = ?'
+SELECT_EMAIL_SQL = 'SELECT 1 FROM accounts WHERE contact_info = ?'
+SELECT_PAGE_SQL = ('SELECT account_id, name, contact_info, account_type, balance FROM accounts '
+                   'WHERE account_id > ? ORDER BY account_id LIMIT ?')
+COUNT_ACCOUNTS_SQL = 'SELECT COUNT(*) FROM accounts'
+UPDATE_BALANCE_SQL = 'UPDATE accounts SET balance = ? WHERE account_id = ?'
+BALANCE_COUNTS_SQL = ('SELECT account_type, CAST(ROUND(balance * 100) AS INTEGER), COUNT(*) FROM accounts '
+                      'GROUP BY account_type, 2')
+
+
+class SQLiteStorage(StorageBackend):
+    def __init__(self, path, pool_size=4, batch_size=500, page_size=1000):
+        """
+        Storage backend that keeps accounts in a SQLite database file.
+
+        Balance postings are buffered and committed in batches of batch_size, so
+        up to one batch of postings can be lost if the process dies before
+        flush() or close() is called. Both legs of a transfer always land in the
+        same commit.
+
+        The connection pool lets the backend itself be called from several
+        threads, but the Bank using it is still single-threaded: see Bank.
+
+        :param path: Path of the database file (created if it does not exist)
+        :param pool_size: Number of connections kept open for reuse
+        :param batch_size: Number of buffered postings that triggers a commit
+        :param page_size: Number of rows fetched per query when iterating accounts
+        """
+        if pool_size <= 0 or batch_size <= 0 or page_size <= 0:
+            raise ValueError("Pool, batch and page sizes must be greater than zero.")
+        self.path = path
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.accounts = _AccountTable(self)
+        self._pending = {}  # account_id -> balance not yet committed
+        self._pending_lock = threading.Lock()
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as connection:
+            connection.execute(CREATE_TABLE_SQL)
+
+    def _connect(self):
+        # isolation_level=None leaves transactions to the explicit BEGIN/COMMIT below.
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                     cached_statements=64)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        connection = self._pool.get()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    def add_account(self, account):
+        user = account.user
+        with self._connection() as connection:
+            cursor = connection.execute(INSERT_ACCOUNT_SQL,
+                                        (user.name, user.contact_info, account.account_type, account.balance))
+        return cursor.lastrowid
+
+    def get_account(self, account_id):
+        with self._connection() as connection:
+            row = connection.execute(SELECT_ACCOUNT_SQL, (account_id,)).fetchone()
+        if row is None:
+            return None
+        return self._load(account_id, *row)
+
+    def has_email(self, email):
+        with self._connection() as connection:
+            return connection.execute(SELECT_EMAIL_SQL, (email,)).fetchone() is not None
+
+    def iter_accounts(self, after_id=0):
+        # Keyset pagination: each query resumes from the last ID seen, so the
+        # whole table is never pulled into memory at once.
+        while True:
+            with self._connection() as connection:
+                rows = connection.execute(SELECT_PAGE_SQL, (after_id, self.page_size)).fetchall()
+            for account_id, name, contact_info, account_type, balance in rows:
+                yield account_id, self._load(account_id, name, contact_info, account_type, balance)
+            if len(rows) < self.page_size:
+                return
+            after_id = rows[-1][0]
+
+    def count(self):
+        with self._connection() as connection:
+            return connection.execute(COUNT_ACCOUNTS_SQL).fetchone()[0]
+
+    def balance_counts(self):
+        # Counted by SQLite, so no account is loaded; buffered postings are written first so the query sees them
+        self.flush()
+        with self._connection() as connection:
+            yield from connection.execute(BALANCE_COUNTS_SQL)
+
+    def record_postings(self, postings):
+        with self._pending_lock:
+            for account_id, balance in postings:
+                self._pending[account_id] = balance
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, {}
+        self._commit(batch)
+
+    def flush(self):
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+        if batch:
+            self._commit(batch)
+
+    def close(self):
+        self.flush()
+        while not self._pool.empty():
+            self._pool.get().close()
+
+    def _commit(self, batch):
+        with self._connection() as connection:
+            try:
+                connection.execute('BEGIN')
+                self._write_batch(connection, batch)
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                with self._pending_lock:
+                    # Keep the failed postings unless newer ones replaced them meanwhile.
+                    self._pending = {**batch, **self._pending}
+                raise
+
+    def _write_batch(self, connection, batch):
+        # Runs inside the commit's transaction; subclasses may write more rows that must land with the postings
+        connection.executemany(UPDATE_BALANCE_SQL, [(balance, account_id) for account_id, balance in batch.items()])
+
+    def _load(self, account_id, name, contact_info, account_type, balance):
+        # Buffered postings are newer than what the database holds.
+        account = Account(User(name, contact_info), account_type)
+        # Set the stored balance as-is; the constructor would round it again.
+        account.balance = self._pending.get(account_id, balance)
+        return account
+
+
+class _AccountTable(Mapping):
+    """Read-only mapping view of the accounts stored in a SQLiteStorage."""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getitem__(self, account_id):
+        account = self._storage.get_account(account_id)
+        if account is None:
+            raise KeyError(account_id)
+        return account
+
+    def get(self, account_id, default=None):
+        account = self._storage.get_account(account_id)
+        return default if account is None else account
+
+    def __iter__(self):
+        for account_id, _ in self._storage.iter_accounts():
+            yield account_id
+
+    def items(self):
+        return self._storage.iter_accounts()
+
+    def __len__(self):
+        return self._storage.count()
@@ -0,0 +1,146 @@
+import time
+from collections import OrderedDict
+
+from banking import VelocityLimitError
+
+
+class SlidingWindowCounter:
+    """
+    Per-account posting counts and amounts over a sliding time window.
+
+    The window is split into a fixed number of buckets kept in a ring buffer, so
+    adding a posting or reading the window totals touches at most `buckets`
+    slots no matter how many postings the account has made. Amounts are kept in
+    whole cents to avoid float drift in the running totals.
+
+    Only accounts that posted within the last window are tracked; idle ones are
+    dropped as time moves on, so memory follows the number of active accounts
+    rather than the size of the bank. max_accounts puts a hard cap on it by
+    forgetting the least recently active account first.
+    """
+
+    def __init__(self, window_seconds=60, buckets=6, max_accounts=None, clock=time.monotonic):
+        """
+        :param window_seconds: Length of the sliding window in seconds
+        :param buckets: Number of ring buffer slots the window is split into
+        :param max_accounts: Maximum number of accounts tracked at once (default is unbounded)
+        :param clock: Function returning the current time in seconds
+        """
+        if window_seconds <= 0 or buckets <= 0:
+            raise ValueError("Window length and bucket count must be greater than zero.")
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.max_accounts = max_accounts
+        self.clock = clock
+        # account_id -> [last_slot, total_count, total_cents, counts, cents],
+        # ordered from least to most recently active.
+        self._states = OrderedDict()
+
+    def totals(self, account_id):
+        """
+        :param account_id: ID of the account to look up
+        :return: Tuple of (posting count, amount in cents) within the current window
+        """
+        state = self._states.get(account_id)
+        if state is None:
+            return 0, 0
+        self._advance(state, self._current_slot())
+        return state[1], state[2]
+
+    def add(self, account_id, amount):
+        """
+        Count one posting of the given amount against the account.
+
+        :param account_id: ID of the account that posted
+        :param amount: Amount of the posting
+        """
+        slot = self._current_slot()
+        state = self._states.get(account_id)
+        if state is None:
+            state = [slot, 0, 0, [0] * self.buckets, [0] * self.buckets]
+            self._states[account_id] = state
+        else:
+            self._advance(state, slot)
+            self._states.move_to_end(account_id)
+        cents = round(amount * 100)
+        index = slot % self.buckets
+        state[1] += 1
+        state[2] += cents
+        state[3][index] += 1
+        state[4][index] += cents
+        self._evict(slot)
+
+    def __len__(self):
+        return len(self._states)
+
+    def _current_slot(self):
+        return int(self.clock() // self.bucket_seconds)
+
+    def _advance(self, state, slot):
+        # Zero every bucket that fell out of the window since the last posting.
+        elapsed = slot - state[0]
+        if elapsed <= 0:
+            return
+        if elapsed >= self.buckets:
+            state[1] = state[2] = 0
+            state[3] = [0] * self.buckets
+            state[4] = [0] * self.buckets
+        else:
+            counts, cents = state[3], state[4]
+            for stale in range(state[0] + 1, slot + 1):
+                index = stale % self.buckets
+                state[1] -= counts[index]
+                state[2] -= cents[index]
+                counts[index] = cents[index] = 0
+        state[0] = slot
+
+    def _evict(self, slot):
+        # The oldest entry sits at the front, so this stops at the first account
+        # that is still inside the window: amortized O(1) per posting.
+        states = self._states
+        while states:
+            account_id, state = next(iter(states.items()))
+            if slot - state[0] < self.buckets and (self.max_accounts is None or len(states) <= self.max_accounts):
+                break
+            del states[account_id]
+
+
+class VelocityRule:
+    def __init__(self, max_count=None, max_amount=None, window_seconds=60, operations=('withdraw', 'transfer'),
+                 buckets=6, max_accounts=None, clock=time.monotonic):
+        """
+        Posting rule limiting how often and how much money can leave an account.
+
+        Add it to a Bank with Bank.add_posting_rule; postings that would go over
+        either limit within the window raise VelocityLimitError.
+
+        :param max_count: Maximum number of postings per account within the window
+        :param max_amount: Maximum total amount per account within the window
+        :param window_seconds: Length of the sliding window in seconds
+        :param operations: Operations the rule applies to
+        :param buckets: Number of ring buffer slots the window is split into
+        :param max_accounts: Maximum number of accounts tracked at once (default is unbounded)
+        :param clock: Function returning the current time in seconds
+        """
+        if max_count is None and max_amount is None:
+            raise ValueError("At least one of max_count and max_amount must be set.")
+        self.max_count = max_count
+        self.max_cents = None if max_amount is None else round(max_amount * 100)
+        self.operations = frozenset(operations)
+        self.counter = SlidingWindowCounter(window_seconds, buckets, max_accounts, clock)
+
+    def check(self, operation, account_id, amount):
+        if operation not in self.operations:
+            return
+        count, cents = self.counter.totals(account_id)
+        if self.max_count is not None and count + 1 > self.max_count:
+            raise VelocityLimitError(f"Account {account_id} exceeded {self.max_count} postings "
+                                     f"per {self.counter.window_seconds:g} seconds.")
+        if self.max_cents is not None and cents + round(amount * 100) > self.max_cents:
+            raise VelocityLimitError(f"Account {account_id} exceeded ${self.max_cents / 100:.2f} "
+                                     f"per {self.counter.window_seconds:g} seconds.")
+
+    def record(self, operation, account_id, amount):
+        if operation in self.operations:
+            self.counter.add(account_id, amount)
@@ -0,0 +1,113 @@
+import io
+import time
+
+from csv_parsing_compression import open_export
+from csv_parsing_schema import CONTINUATION, HEADER, PATIENT_EXPORT_SCHEMA, RECORD, SKIP
+
+def parse_csv(file_path, index=None, schema=PATIENT_EXPORT_SCHEMA):
+    '''
+    Parses the given CSV file, skipping metadata and merging multi-line addresses.
+
+    Args:
+        file_path (str): The path to the CSV file to be parsed, which may be
+            gzip/bz2/xz/zstd-compressed.
+        index (PatientIndex): Optional index every record is added to as it is read.
+        schema (ReportSchema): The layout of the export.
+
+    Returns:
+        tuple: The column headers (None if the file has none) and a dict of the
+        patient records keyed by their position in the file.
+
+    Raises:
+        ValueError: If the header row does not match the schema's field names.
+    '''
+    import csv # Imported here so that importing this module does not load csv and re
+
+    compiled = schema.compile()
+    with io.TextIOWrapper(open_export(file_path), newline='') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=',')
+        column_headers = None
+        table, default = compiled.pre_header # switched to post_header once the column headers are read
+        record_count = 0
+        patient_records = {}
+
+        for row in csv_reader:
+            kind = table.get(row[0], default)
+
+            # Skip metadata lines until column headers are reached in file, and repeated column headers
+            if kind is SKIP:
+                continue
+
+            # Parse records
+            if kind is RECORD:
+                patient_records[record_count] = list(filter(None, row))
+                if index is not None:
+                    index.add(row, patient_records[record_count])
+                record_count += 1
+
+            # Get city and state address in multi-line data and add to address in row(s) above
+            elif kind is CONTINUATION:
+                if patient_records:
+                    compiled.merge(patient_records[record_count-1], row)
+
+            # Parse column headers
+            elif kind is HEADER:
+                column_headers = list(filter(None, row))
+                compiled.check_header(column_headers)
+                table, default = compiled.post_header
+                if index is not None:
+                    index.set_column_headers(row)
+
+    return column_headers, patient_records
+
+def print_records(column_headers, patient_records):
+    '''
+    Prints the column headers, every patient record and the number of records.
+
+    Args:
+        column_headers (list): The column headers, or None if the file has none.
+        patient_records (dict): The patient records keyed by their position in the file.
+    '''
+    if column_headers is not None:
+        print(column_headers)
+
+    # Output patient records
+    for value in patient_records.values():
+        print(value)
+
+    # Print the total number of processed records
+    print(f'\nProcessed {len(patient_records)} records')
+
+def process_csv(file_path, parser=None, stats=None):
+    '''
+    Processes the given CSV file, skipping metadata and printing the column headers and rows.
+
+    Args:
+        file_path (str): The path to the CSV file to be processed.
+        parser (callable): Function returning the column headers and patient records
+            for a file (default is parse_csv).
+        stats (ParseStats): Optional csv_parsing_profile.ParseStats to time and count
+            each stage with; the file is then parsed by its instrumented parse loop,
+            so it cannot be combined with parser.
+    '''
+    if parser is not None and stats is not None:
+        raise ValueError('stats parses the file with its own instrumented loop and cannot time another parser.')
+    import csv
+
+    try:
+        if stats is None:
+            print_records(*(parser or parse_csv)(file_path))
+        else:
+            column_headers, patient_records = stats.parse(file_path)
+            output_start = time.perf_counter()
+            print_records(column_headers, patient_records)
+            stats.timers['output'] += time.perf_counter() - output_start
+
+    except FileNotFoundError:
+        print(f'Error: The file "{file_path}" was not found.')
+    
+    except csv.Error as e:
+        print(f'Error: There was an issue with CSV parsing: {e}')
+    
+    except Exception as e:
+        print(f'An unexpected error occurred: {e}')
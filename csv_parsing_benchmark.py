@@ -0,0 +1,113 @@
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import time
+
+from csv_parsing import parse_csv
+
+METADATA_ROWS = [
+    'Total number of Patients: {count},,,,,,Sample PM system,,,,,,Print Date:,06/10/2013,',
+    'Pm system,,,,,,,,,,,,Print User:,"User, Test",',
+    'street address,,,,,,,,,,,,,,',
+    'city and state,,,,,,,,,,,,,,',
+]
+HEADER_ROW = 'Patient Name,,Gender,DOB,Language,Acct#,Race,Ethnicity,Phone#,,Email,,Home Address,,Reminder Method'
+PATIENT_ROWS = [
+    ['"Patient {n}, Test",,M,7/19/2068,English,{n},Declined,Declined,(111)123-1234,,sample@example.com,,street address,,cell',
+     ',,,,,,,,,,,,,city and state,'],
+    ['"Patient {n}, Test",,M,2/8/1999,English,{n},Declined,Declined,(111)123-1234,,sample@example.com,,RTN MAIL FROM:,,<none>',
+     ',,,,,,,,,,,,street address,,',
+     ',,,,,,,,,,,,city and state,,'],
+]
+HEADER_EVERY = 50 # The export repeats the header block every page
+
+def write_sample_export(file_path, patient_count):
+    '''
+    Writes a synthetic export in the layout of training_csv_file.csv.
+
+    Args:
+        file_path (str): The path of the file to write.
+        patient_count (int): The number of patient records to write.
+    '''
+    with open(file_path, mode='w', newline='') as csv_file:
+        csv_file.write('\r\n'.join(METADATA_ROWS).format(count=patient_count) + '\r\n')
+        csv_file.write(HEADER_ROW + '\r\n,,,,,,,,,,,,,,\r\n')
+        for n in range(1, patient_count + 1):
+            if n % HEADER_EVERY == 0:
+                csv_file.write(HEADER_ROW + '\r\n')
+            for row in PATIENT_ROWS[n % 2]:
+                csv_file.write(row.format(n=n) + '\r\n')
+
+def time_parser(parser, file_path, repeat):
+    '''
+    Returns the best wall-clock time of several parser runs and the last result.
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parser(file_path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def compress_file(file_path, compression):
+    '''
+    Writes a compressed copy of a file next to it.
+
+    Args:
+        file_path (str): The path of the file to compress.
+        compression (str): 'gzip', 'bz2', 'xz' or 'zstd'.
+
+    Returns:
+        str: The path of the compressed copy.
+    '''
+    if compression == 'zstd':
+        import zstandard
+        open_compressed = lambda path: zstandard.ZstdCompressor().stream_writer(open(path, mode='wb'))
+    else:
+        opener = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}[compression]
+        open_compressed = lambda path: opener(path, mode='wb')
+    compressed_path = f'{file_path}.{compression}'
+    with open(file_path, mode='rb') as source, open_compressed(compressed_path) as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+    return compressed_path
+
+def available_compressions():
+    compressions = ['gzip', 'bz2', 'xz']
+    try:
+        import zstandard
+        compressions.append('zstd')
+    except ImportError:
+        pass
+    return compressions
+
+def run_benchmark(patient_count, repeat, compressions):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'export.csv')
+        write_sample_export(file_path, patient_count)
+        size_mb = os.path.getsize(file_path) / 1e6
+        inputs = [('plain', file_path)] + [(name, compress_file(file_path, name)) for name in compressions]
+
+        print(f'{patient_count} records, {size_mb:.1f} MB uncompressed; throughput is in uncompressed MB/s')
+        expected = None
+        for input_name, input_path in inputs:
+            stored_mb = os.path.getsize(input_path) / 1e6
+            seconds, result = time_parser(parse_csv, input_path, repeat)
+            expected = result if expected is None else expected
+            if result != expected:
+                raise AssertionError(f'{input_name}: parser output differs from the plain file parse')
+
+            print(f'{input_name:>6} ({stored_mb:5.1f} MB on disk): {seconds:.3f} s  {size_mb / seconds:7.1f} MB/s  '
+                  f'{patient_count / seconds:10.0f} records/s')
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time parse_csv on a plain export and its compressed copies.')
+    arg_parser.add_argument('--records', type=int, default=200000, help='number of patient records to generate')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs per input; the best time is reported')
+    arg_parser.add_argument('--compression', action='append', choices=['gzip', 'bz2', 'xz', 'zstd'],
+                            help='compressed inputs to benchmark (default is every available format)')
+    args = arg_parser.parse_args()
+    run_benchmark(args.records, args.repeat, args.compression or available_compressions())
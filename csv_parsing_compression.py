@@ -0,0 +1,66 @@
+# Leading bytes of each supported compressed format
+MAGIC_NUMBERS = {
+    'gzip': b'\x1f\x8b',
+    'bz2': b'BZh',
+    'xz': b'\xfd7zXZ\x00',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+MAGIC_LENGTH = max(len(magic) for magic in MAGIC_NUMBERS.values())
+
+def detect_compression(file_path):
+    '''
+    Identifies the compression of a file from its first bytes.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: One of the MAGIC_NUMBERS keys, or None for an uncompressed file.
+    '''
+    with open(file_path, mode='rb') as raw_file:
+        head = raw_file.read(MAGIC_LENGTH)
+    for compression, magic in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+def _open_zstd(file_path):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(f'Reading the zstd-compressed file "{file_path}" requires the zstandard package.') from None
+    raw_file = open(file_path, mode='rb')
+    try:
+        return zstandard.ZstdDecompressor().stream_reader(raw_file, closefd=True)
+    except Exception:
+        raw_file.close()
+        raise
+
+def open_export(file_path):
+    '''
+    Opens an export for binary reading, decompressing it on the fly if needed.
+
+    The format is detected from the file's magic bytes rather than its name.
+    Decompression is streamed: read(n) only decompresses as much as it needs,
+    so no decompressed copy is ever written to disk or held in memory whole.
+
+    Args:
+        file_path (str): The path to the plain or gzip/bz2/xz/zstd-compressed file.
+
+    Returns:
+        A binary file object yielding the uncompressed bytes.
+    '''
+    # The decompressors are imported on demand so plain exports never load them
+    compression = detect_compression(file_path)
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(file_path, mode='rb')
+    if compression == 'bz2':
+        import bz2
+        return bz2.open(file_path, mode='rb')
+    if compression == 'xz':
+        import lzma
+        return lzma.open(file_path, mode='rb')
+    if compression == 'zstd':
+        return _open_zstd(file_path)
+    return open(file_path, mode='rb')
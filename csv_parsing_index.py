@@ -0,0 +1,100 @@
+class PatientIndex:
+    '''
+    Hash indexes over patient records, filled in while a file is being parsed.
+
+    Pass an index to parse_csv and every record is added as soon as it is
+    read, so duplicate Acct# values are caught as they arrive and lookups by
+    Acct#, name, phone or email are dict lookups afterwards. The same index can
+    be passed to several parses to merge or dedupe exports without a second
+    pass over the records.
+
+    Fields are looked up in the row as it was read, before empty cells are
+    removed, at the positions of their columns in the unfiltered header row.
+    Looking them up in the filtered record instead would shift every later
+    field whenever a cell is blank.
+    '''
+
+    def __init__(self, column_headers=None):
+        '''
+        Args:
+            column_headers (list): The unfiltered column header row of the
+                export. If None, the parser sets it from the header row it reads.
+        '''
+        self.acct_position = self.name_position = self.phone_position = self.email_position = None
+        self.by_acct = {} # Acct# -> first record seen with it
+        self.by_name = {} # name -> records
+        self.by_phone = {} # phone -> records
+        self.by_email = {} # email -> records
+        self.duplicates = {} # Acct# -> records seen after the first one
+        if column_headers is not None:
+            self.set_column_headers(column_headers)
+
+    def set_column_headers(self, column_headers):
+        '''
+        Locates the indexed fields in the column header row.
+
+        Args:
+            column_headers (list): The unfiltered column header row, as read from the file.
+        '''
+        self.acct_position = column_headers.index('Acct#')
+        self.name_position = column_headers.index('Patient Name')
+        self.phone_position = column_headers.index('Phone#')
+        self.email_position = column_headers.index('Email')
+
+    def add(self, row, record=None):
+        '''
+        Adds a record to the indexes. Blank fields are not indexed.
+
+        Args:
+            row (list): The record's row as read from the file, empty cells included.
+            record (list): The patient record to store (default is the row without its empty cells).
+
+        Returns:
+            bool: False if a record with the same Acct# was already added.
+        '''
+        if self.acct_position is None:
+            raise ValueError('The column headers must be set before records are added.')
+        if record is None:
+            record = list(filter(None, row))
+        size = len(row)
+        name = row[self.name_position] if self.name_position < size else None
+        if name:
+            self.by_name.setdefault(name, []).append(record)
+        phone = row[self.phone_position] if self.phone_position < size else None
+        if phone:
+            self.by_phone.setdefault(phone, []).append(record)
+        email = row[self.email_position] if self.email_position < size else None
+        if email:
+            self.by_email.setdefault(email, []).append(record)
+
+        acct = row[self.acct_position] if self.acct_position < size else None
+        if not acct:
+            return True
+        if acct in self.by_acct:
+            self.duplicates.setdefault(acct, []).append(record)
+            return False
+        self.by_acct[acct] = record
+        return True
+
+    def find_by_acct(self, acct):
+        '''Returns the first record with the given Acct#, or None.'''
+        return self.by_acct.get(acct)
+
+    def find_by_name(self, name):
+        '''Returns the records with the given patient name.'''
+        return self.by_name.get(name, [])
+
+    def find_by_phone(self, phone):
+        '''Returns the records with the given phone number.'''
+        return self.by_phone.get(phone, [])
+
+    def find_by_email(self, email):
+        '''Returns the records with the given email address.'''
+        return self.by_email.get(email, [])
+
+    def unique_records(self):
+        '''Returns the first record seen for every Acct#, in the order they arrived.'''
+        return list(self.by_acct.values())
+
+    def __len__(self):
+        return len(self.by_acct)
@@ -0,0 +1,194 @@
+import argparse
+import glob
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from csv_parsing import parse_csv
+
+# Files a directory source expands to; open_export tells the compression from the contents, not the suffix
+EXPORT_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.csv.zst')
+
+class FileResult:
+    '''
+    The outcome of parsing one export file.
+
+    Attributes:
+        file_path (str): The path of the parsed file.
+        column_headers (list): The column headers, or None if the file has none.
+        patient_records (dict): The patient records keyed by their position in the file.
+        bytes_read (int): The size of the file.
+        parse_seconds (float): The wall-clock time spent parsing the file.
+        error (str): A description of the failure, or None if the file parsed.
+    '''
+
+    def __init__(self, file_path, column_headers=None, patient_records=None, bytes_read=0, parse_seconds=0.0,
+                 error=None):
+        self.file_path = file_path
+        self.column_headers = column_headers
+        self.patient_records = patient_records if patient_records is not None else {}
+        self.bytes_read = bytes_read
+        self.parse_seconds = parse_seconds
+        self.error = error
+
+    @property
+    def record_count(self):
+        return len(self.patient_records)
+
+    def __repr__(self):
+        if self.error is not None:
+            return f'FileResult({self.file_path!r}, error={self.error!r})'
+        return (f'FileResult({self.file_path!r}, records={self.record_count}, bytes={self.bytes_read}, '
+                f'seconds={self.parse_seconds:.3f})')
+
+def expand_paths(source):
+    '''
+    Resolves a directory, glob pattern, file path or list of those to file paths.
+
+    Args:
+        source (str or list): Where to look for export files. A directory
+            stands for every file directly inside it whose name ends in one of
+            EXPORT_SUFFIXES, i.e. plain and compressed exports.
+
+    Returns:
+        list: The matching file paths, sorted within each source.
+    '''
+    if not isinstance(source, str):
+        return [path for item in source for path in expand_paths(item)]
+    if os.path.isdir(source):
+        return sorted(entry.path for entry in os.scandir(source)
+                      if entry.is_file() and entry.name.endswith(EXPORT_SUFFIXES))
+    if glob.has_magic(source):
+        return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+    return [source]
+
+def parse_file(file_path, parser=parse_csv):
+    '''
+    Parses one file and records its stats, turning any failure into FileResult.error.
+
+    Args:
+        file_path (str): The path to the CSV file to be parsed.
+        parser (callable): Function returning the column headers and patient records.
+
+    Returns:
+        FileResult: The parsed records and stats for the file.
+    '''
+    start = time.perf_counter()
+    try:
+        bytes_read = os.path.getsize(file_path)
+        column_headers, patient_records = parser(file_path)
+    except Exception as e:
+        return FileResult(file_path, parse_seconds=time.perf_counter() - start, error=f'{type(e).__name__}: {e}')
+    return FileResult(file_path, column_headers, patient_records, bytes_read, time.perf_counter() - start)
+
+def ingest_exports(source, max_workers=None, max_pending=None, parser=parse_csv):
+    '''
+    Parses many export files concurrently and yields each FileResult as soon as it is ready.
+
+    Files are parsed in a pool of worker processes. At most max_pending files
+    are submitted at any time and new ones are only submitted as results are
+    consumed, so a slow consumer holds back the workers instead of letting
+    parsed records pile up in memory. A file that fails to parse produces a
+    FileResult with error set and does not hold up the other files.
+
+    A worker that dies breaks the whole pool and fails every file in flight,
+    not just the one that killed it. The pool is then rebuilt and those files
+    are retried one at a time, so only the file that crashes a worker on its
+    own is reported as failed.
+
+    Args:
+        source (str or list): A directory, glob pattern, file path or list of those.
+        max_workers (int): The number of worker processes (default is the CPU count).
+        max_pending (int): The maximum number of files in flight (default is twice the workers).
+        parser (callable): Module-level function returning the column headers and patient records.
+
+    Yields:
+        FileResult: One result per file, in completion order.
+    '''
+    file_paths = expand_paths(source)
+    if not file_paths:
+        return
+    max_workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+    max_pending = max_pending or 2 * max_workers
+
+    waiting = deque(file_paths)
+    suspects = deque() # Files that were in flight when a worker died, retried alone
+    pending = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            broken = False
+            try:
+                if suspects:
+                    if not pending:
+                        pending[executor.submit(parse_file, suspects[0], parser)] = suspects[0]
+                        suspects.popleft()
+                else:
+                    while len(pending) < max_pending and waiting:
+                        pending[executor.submit(parse_file, waiting[0], parser)] = waiting[0]
+                        waiting.popleft()
+            except BrokenProcessPool:
+                broken = True
+
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                broken = broken or any(isinstance(future.exception(), BrokenProcessPool) for future in done)
+                if broken:
+                    # Once the pool is broken every future in flight fails, so collect them all
+                    done, _ = wait(pending)
+                alone = len(pending) == 1
+                for future in done:
+                    file_path = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except BrokenProcessPool as e:
+                        if alone:
+                            yield FileResult(file_path, error=f'{type(e).__name__}: {e}')
+                        else:
+                            suspects.append(file_path)
+                    except Exception as e:
+                        yield FileResult(file_path, error=f'{type(e).__name__}: {e}')
+            elif not broken:
+                return
+
+            if broken:
+                executor.shutdown()
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def iter_patient_records(results):
+    '''
+    Flattens FileResults into one stream of records, skipping files that failed.
+
+    Args:
+        results (iterable): FileResult objects, e.g. from ingest_exports.
+
+    Yields:
+        tuple: The file path and one of its patient records.
+    '''
+    for result in results:
+        for record in result.patient_records.values():
+            yield result.file_path, record
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Parse many patient exports in parallel.')
+    arg_parser.add_argument('source', nargs='+', help='directories, glob patterns or files to parse')
+    arg_parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    args = arg_parser.parse_args()
+
+    total_records = total_bytes = failed = 0
+    start = time.perf_counter()
+    for result in ingest_exports(args.source, max_workers=args.workers):
+        if result.error is not None:
+            failed += 1
+            print(f'{result.file_path}: failed ({result.error})')
+            continue
+        total_records += result.record_count
+        total_bytes += result.bytes_read
+        print(f'{result.file_path}: {result.record_count} records, {result.bytes_read} bytes, '
+              f'{result.parse_seconds:.3f} s')
+    print(f'\nProcessed {total_records} records ({total_bytes} bytes) in {time.perf_counter() - start:.3f} s, '
+          f'{failed} files failed')
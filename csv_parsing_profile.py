@@ -0,0 +1,208 @@
+import argparse
+import contextlib
+import cProfile
+import csv
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+
+from csv_parsing_compression import open_export
+from csv_parsing_schema import CONTINUATION, HEADER, PATIENT_EXPORT_SCHEMA, RECORD, SKIP
+from csv_parsing import print_records
+
+STAGES = ('read', 'tokenize', 'classify', 'build_records', 'merge', 'output')
+
+class _TimedReader(io.RawIOBase):
+    '''Binary reader that counts the bytes and time spent reading from the wrapped file.'''
+
+    def __init__(self, binary_file, stats):
+        self._file = binary_file
+        self._stats = stats
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        start = time.perf_counter()
+        data = self._file.read(len(buffer))
+        self._stats.timers['read'] += time.perf_counter() - start
+        self._stats.counters['bytes_read'] += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+class ParseStats:
+    '''
+    Per-stage timers and counters for one instrumented run of process_csv.
+
+    Pass an instance as process_csv(file_path, stats=ParseStats()) to get a
+    breakdown of where the time went. The instrumented parse mirrors the
+    parse_csv loop with timers around each stage, so process_csv without stats
+    runs the plain loop and pays nothing for the instrumentation.
+
+    Attributes:
+        timers (dict): Seconds spent in each of STAGES. Tokenize excludes the
+            time spent reading from the file.
+        counters (dict): rows_scanned, metadata_rows_skipped, header_rows,
+            records, continuation_rows_merged and bytes_read.
+    '''
+
+    def __init__(self, schema=PATIENT_EXPORT_SCHEMA):
+        self.schema = schema
+        self.timers = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(('rows_scanned', 'metadata_rows_skipped', 'header_rows', 'records',
+                                       'continuation_rows_merged', 'bytes_read'), 0)
+
+    def parse(self, file_path, index=None):
+        '''
+        Parses the given CSV file like parse_csv, timing and counting every stage.
+
+        Args:
+            file_path (str): The path to the CSV file to be parsed.
+            index (PatientIndex): Optional index every record is added to as it is read.
+
+        Returns:
+            tuple: The column headers and the patient records, as parse_csv returns them.
+        '''
+        compiled = self.schema.compile()
+        timers = self.timers
+        counters = self.counters
+        clock = time.perf_counter
+        column_headers = None
+        table, default = compiled.pre_header
+        record_count = 0
+        patient_records = {}
+
+        raw_file = _TimedReader(open_export(file_path), self)
+        with io.TextIOWrapper(io.BufferedReader(raw_file), newline='') as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',')
+            while True:
+                read_before = timers['read']
+                start = clock()
+                row = next(csv_reader, None)
+                tokenized = clock()
+                timers['tokenize'] += tokenized - start - (timers['read'] - read_before)
+                if row is None:
+                    break
+                counters['rows_scanned'] += 1
+
+                kind = table.get(row[0], default)
+                classified = clock()
+                timers['classify'] += classified - tokenized
+
+                if kind is SKIP:
+                    if column_headers is None:
+                        counters['metadata_rows_skipped'] += 1
+                    else:
+                        counters['header_rows'] += 1
+                elif kind is RECORD:
+                    patient_records[record_count] = list(filter(None, row))
+                    if index is not None:
+                        index.add(row, patient_records[record_count])
+                    record_count += 1
+                    counters['records'] += 1
+                    timers['build_records'] += clock() - classified
+                elif kind is CONTINUATION:
+                    if patient_records and any(row):
+                        compiled.merge(patient_records[record_count-1], row)
+                        counters['continuation_rows_merged'] += 1
+                    timers['merge'] += clock() - classified
+                elif kind is HEADER:
+                    column_headers = list(filter(None, row))
+                    compiled.check_header(column_headers)
+                    table, default = compiled.post_header
+                    if index is not None:
+                        index.set_column_headers(row)
+                    counters['header_rows'] += 1
+
+        return column_headers, patient_records
+
+    def as_dict(self):
+        '''Returns the timers and counters as a JSON-serializable dict.'''
+        return {
+            'timers': {stage: round(seconds, 6) for stage, seconds in self.timers.items()},
+            'total_seconds': round(sum(self.timers.values()), 6),
+            'counters': dict(self.counters),
+        }
+
+def _parse_and_print(file_path, stats):
+    # What process_csv does with stats, minus its error handling, so failures reach the caller
+    column_headers, patient_records = stats.parse(file_path)
+    output_start = time.perf_counter()
+    print_records(column_headers, patient_records)
+    stats.timers['output'] += time.perf_counter() - output_start
+
+def profile_process_csv(file_path, report_path, mode='stages', top=25):
+    '''
+    Parses and prints a CSV file like process_csv with instrumentation and writes a JSON report.
+
+    Unlike process_csv, errors are not caught: a missing or unparsable file
+    raises instead of producing an empty report.
+
+    Args:
+        file_path (str): The path to the CSV file to be processed.
+        report_path (str): The path of the JSON report to write.
+        mode (str): 'stages' for the per-stage timers and counters only,
+            'cprofile' to also record the functions with the most cumulative
+            time, or 'tracemalloc' to also record peak memory and the lines
+            holding the most memory once parsing is done (this mode skips the
+            output stage).
+        top (int): The number of functions or allocation sites to report.
+
+    Returns:
+        dict: The report that was written.
+    '''
+    if mode not in ('stages', 'cprofile', 'tracemalloc'):
+        raise ValueError(f'Unknown profiling mode "{mode}".')
+    stats = ParseStats()
+    report = {'file_path': file_path, 'mode': mode}
+
+    # The printed records are not part of the report
+    with open(os.devnull, mode='w') as devnull, contextlib.redirect_stdout(devnull):
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.runcall(_parse_and_print, file_path, stats)
+            function_stats = pstats.Stats(profiler)
+            report['functions'] = [
+                {'function': f'{filename}:{line}({name})', 'calls': calls, 'total_seconds': round(total, 6),
+                 'cumulative_seconds': round(cumulative, 6)}
+                for (filename, line, name), (_, calls, total, cumulative, _)
+                in sorted(function_stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+            ]
+        elif mode == 'tracemalloc':
+            # Parse without printing so the snapshot is taken while the records are still alive
+            tracemalloc.start()
+            try:
+                parsed = stats.parse(file_path)
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            del parsed
+            report['peak_bytes'] = peak
+            report['allocations'] = [
+                {'location': str(statistic.traceback), 'bytes': statistic.size, 'blocks': statistic.count}
+                for statistic in snapshot.statistics('lineno')[:top]
+            ]
+        else:
+            _parse_and_print(file_path, stats)
+
+    report.update(stats.as_dict())
+    with open(report_path, mode='w') as report_file:
+        json.dump(report, report_file, indent=2)
+    return report
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Profile process_csv on an export and write a JSON report.')
+    arg_parser.add_argument('file_path', help='export to process')
+    arg_parser.add_argument('--report', default='parse_profile.json', help='path of the JSON report')
+    arg_parser.add_argument('--mode', choices=['stages', 'cprofile', 'tracemalloc'], default='stages')
+    args = arg_parser.parse_args()
+    report = profile_process_csv(args.file_path, args.report, args.mode)
+    print(json.dumps({key: report[key] for key in ('timers', 'total_seconds', 'counters')}, indent=2))
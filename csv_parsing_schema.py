@@ -0,0 +1,106 @@
+SKIP = 'skip' # Row is ignored
+HEADER = 'header' # Row holds the column headers
+RECORD = 'record' # Row starts a new record
+CONTINUATION = 'continuation' # Row carries more data for the record above
+
+class ReportSchema:
+    '''
+    Declarative description of a metadata-prefixed report export.
+
+    Attributes:
+        header_sentinel (str): The first cell of the column header row. Rows
+            before the first header row are metadata and are skipped, and
+            later repeats of the header row are skipped too.
+        field_names (list): The column headers once empty cells are removed.
+            Parsers reject a file whose header row differs, since records
+            are laid out by these positions.
+        continuation_value (str): The first cell of a row that continues the
+            record above it instead of starting a new one.
+        merge_field (str): The field that continuation values are appended to,
+            separated by spaces. If None, they are added to the end of the record.
+    '''
+
+    def __init__(self, header_sentinel, field_names, continuation_value='', merge_field=None):
+        if continuation_value == header_sentinel:
+            raise ValueError('The continuation value must differ from the header sentinel.')
+        if merge_field is not None and merge_field not in field_names:
+            raise ValueError(f'Merge field "{merge_field}" is not one of the field names.')
+        self.header_sentinel = header_sentinel
+        self.field_names = list(field_names)
+        self.continuation_value = continuation_value
+        self.merge_field = merge_field
+        self._compiled = None
+
+    def compile(self):
+        '''
+        Returns the precomputed dispatch tables for this schema, building them on first use.
+
+        Returns:
+            CompiledSchema: The row classification tables and merge column.
+        '''
+        if self._compiled is None:
+            self._compiled = CompiledSchema(self)
+        return self._compiled
+
+class CompiledSchema:
+    '''
+    Row classification tables for a ReportSchema.
+
+    Each table maps the first cell of a row to its kind, with a default for
+    every other value, so classifying a row is a single dict lookup:
+    table.get(row[0], default). Parsers use the pre-header table until they
+    see the header row and the post-header table afterwards.
+
+    Attributes:
+        pre_header (tuple): The table and default used before the header row.
+        post_header (tuple): The table and default used after the header row.
+        merge_column (int): The position continuation values are merged into,
+            or None to append them to the record.
+    '''
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.pre_header = ({schema.header_sentinel: HEADER}, SKIP)
+        self.post_header = ({schema.header_sentinel: SKIP, schema.continuation_value: CONTINUATION}, RECORD)
+        self.merge_column = (None if schema.merge_field is None
+                             else schema.field_names.index(schema.merge_field))
+
+    def check_header(self, column_headers):
+        '''
+        Checks that the header row read from a file matches the schema's field names.
+
+        Args:
+            column_headers (list): The header row once empty cells are removed.
+
+        Raises:
+            ValueError: If the headers differ, e.g. a file with reordered columns,
+                whose continuation values would be merged into the wrong field.
+        '''
+        if column_headers != self.schema.field_names:
+            raise ValueError(f'Column headers {column_headers} do not match the schema\'s field names '
+                             f'{self.schema.field_names}.')
+
+    def merge(self, record, values):
+        '''
+        Adds the non-empty values of a continuation row to a record.
+
+        The first cell holds the continuation value that marks the row, not
+        data, so it is never merged.
+
+        Args:
+            record (list): The record the continuation row belongs to.
+            values (list): The cells of the continuation row.
+        '''
+        if self.merge_column is None:
+            record.extend(filter(None, values[1:]))
+            return
+        for item in filter(None, values[1:]):
+            record[self.merge_column] += ' ' + item
+
+PATIENT_EXPORT_SCHEMA = ReportSchema(
+    header_sentinel='Patient Name',
+    field_names=['Patient Name', 'Gender', 'DOB', 'Language', 'Acct#', 'Race', 'Ethnicity', 'Phone#', 'Email',
+                 'Home Address', 'Reminder Method'],
+    continuation_value='', # city and state address lines have an empty first cell
+    merge_field='Home Address',
+)
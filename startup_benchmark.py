@@ -0,0 +1,63 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Library modules that tools and workers import; the entry points are not included
+MODULES = ('banking', 'banking_storage', 'banking_velocity', 'banking_replay', 'csv_parsing',
+           'csv_parsing_index', 'csv_parsing_schema', 'csv_parsing_compression')
+
+def import_times(module):
+    '''
+    Imports a module in a fresh interpreter under "python -X importtime".
+
+    Args:
+        module (str): The name of the module to import.
+
+    Returns:
+        dict: Cumulative import time in microseconds of every module that was
+        imported, keyed by module name.
+    '''
+    environment = dict(os.environ)
+    environment.pop('PYTHONDONTWRITEBYTECODE', None) # Measure with cached bytecode, as a deployed worker runs
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), env=environment,
+                               capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def measure(module, runs):
+    '''
+    Returns the median cumulative import time of a module in milliseconds and
+    the modules its import pulls in beyond those loaded at interpreter startup.
+    '''
+    import_times(module) # Warm-up run, which also writes the bytecode cache
+    samples = [import_times(module) for _ in range(runs)]
+    median_ms = statistics.median(times[module] for times in samples) / 1000
+    startup_modules = import_times('sys') # sys is built in, so this lists only what startup loads
+    return median_ms, sorted(name for name in samples[-1] if name != module and name not in startup_modules)
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the cold import time of the library modules.')
+    arg_parser.add_argument('modules', nargs='*', default=MODULES, help='modules to import')
+    arg_parser.add_argument('--runs', type=int, default=7, help='fresh interpreters per module; the median is reported')
+    arg_parser.add_argument('--budget-ms', type=float, help='exit with an error if any module takes longer')
+    arg_parser.add_argument('--show-imports', action='store_true', help='list the modules each import pulls in')
+    args = arg_parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        median_ms, pulled_in = measure(module, args.runs)
+        print(f'{module:>25}: {median_ms:7.2f} ms')
+        if args.show_imports:
+            print(f'{"":>27}{", ".join(pulled_in) or "(nothing)"}')
+        if args.budget_ms is not None and median_ms > args.budget_ms:
+            over_budget.append(module)
+    if over_budget:
+        sys.exit(f'Over the {args.budget_ms} ms budget: {", ".join(over_budget)}')
@@ -0,0 +1,36 @@
+import logging
+
+import pytest
+
+from banking import Bank
+
+
+@pytest.fixture(autouse=True)
+def quiet_logging():
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def test_heaps_stay_bounded_when_only_min_balance_is_read():
+    bank = Bank()
+    account_id = bank.create_account('Holder', 'holder@example.com', 'Checking', 0)
+    aggregate = bank.aggregates.get('Checking')
+    for n in range(1, 5001):
+        bank.deposit(account_id, 1)
+        assert aggregate.min_balance == n
+    assert len(aggregate._min_heap) <= 2 * len(aggregate._cents_counts) + 64
+    assert len(aggregate._max_heap) <= 2 * len(aggregate._cents_counts) + 64
+    assert aggregate.max_balance == 5000
+
+
+def test_heaps_stay_bounded_when_only_max_balance_is_read():
+    bank = Bank()
+    account_id = bank.create_account('Holder', 'holder@example.com', 'Checking', 5000)
+    aggregate = bank.aggregates.get('Checking')
+    for n in range(4999, -1, -1):
+        bank.withdraw(account_id, 1)
+        assert aggregate.max_balance == n
+    assert len(aggregate._min_heap) <= 2 * len(aggregate._cents_counts) + 64
+    assert len(aggregate._max_heap) <= 2 * len(aggregate._cents_counts) + 64
+    assert aggregate.min_balance == 0
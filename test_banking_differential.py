@@ -0,0 +1,19 @@
+import logging
+
+import pytest
+
+from banking_differential import ENGINES, run_differential
+
+
+@pytest.mark.parametrize('velocity', [False, True])
+def test_engines_match_reference(velocity):
+    logging.disable(logging.CRITICAL)
+    try:
+        results = run_differential(seed=7, account_count=20, operation_count=2000, engines=ENGINES,
+                                   velocity=velocity)
+    finally:
+        logging.disable(logging.NOTSET)
+    assert [result.engine for result in results] == list(ENGINES)
+    for result in results:
+        assert result.equivalent, (result.engine, (result.outcome_mismatches or [])[:3],
+                                   list(result.balance_mismatches.items())[:3])